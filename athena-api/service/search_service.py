@@ -1,21 +1,19 @@
 import math
 from typing import List
 
-import pysolr
-
-from utils.constants import VOCABULARY_FILTERS, SOLR_CONN_STRING
+from utils.constants import VOCABULARY_FILTERS
 from utils.search_util import parse_search_query, has_space
+from utils.solr_client import get_solr
 
 
 def count():
-    solr = pysolr.Solr(SOLR_CONN_STRING)
-    results = solr.search('*:*', rows=0)
+    results = get_solr().search('*:*', rows=0)
     return results.hits
 
 
 def search_athena(page_size: str, page: str, query: str, sort, order, filters: dict, update_filters):
     result_concepts = []
-    solr = pysolr.Solr(SOLR_CONN_STRING, always_commit=True)
+    solr = get_solr()
     filter_queries = create_athena_filter_queries(filters)
     final_query = parse_search_query(query)
     start_record = (int(page) - 1)*int(page_size)
@@ -1,38 +1,58 @@
-import json
-import urllib
-from urllib.request import urlopen
+import threading
+
+import psycopg2
 
 from app import app
-from utils.constants import ATHENA_CORE_NAME
+from utils.constants import ATHENA_CORE_NAME, SOLR_INDEX_WORKERS, SOLR_INDEX_BATCH_SIZE, SOLR_INDEX_FETCH_SIZE, \
+    SOLR_INDEX_SOFT_COMMIT_INTERVAL, SOLR_INDEX_PROGRESS_INTERVAL
+from utils.solr_client import get_solr
+from utils.solr_indexer import SolrIndexer, iterate_rows, row_to_document
 from service import search_service
 
+ATHENA_INDEX_QUERY = 'SELECT concept_id, concept_name, domain_id, vocabulary_id, concept_class_id, ' \
+                     'standard_concept, concept_code, valid_start_date, valid_end_date, invalid_reason, ' \
+                     'concept_name AS concept_name_for_sort FROM vocabulary.concept'
 
-def run_solr_command(command, current_user = ''):
-    resource = urllib.request.urlopen(f"{app.config['SOLR_URL']}/{command}{current_user}")
-    content = resource.read().decode(resource.headers.get_content_charset())
-    return content
+_index_lock = threading.Lock()
 
 
 def create_index_if_not_exist(logger):
     count = search_service.count()
     if count != 0:
         logger.info("Athena Solr data already imported")
-    else:
-        import_status_command = f"solr/{ATHENA_CORE_NAME}/dataimport?command=status&indent=on&wt=json"
-        status_response_str = run_solr_command(import_status_command)
-        status_response = json.loads(status_response_str)
-        status = status_response['status']
-        if status == 'busy':
-            logger.info("The import data process has already started")
-        else:
-            db_host = app.config['VOCABULARY_DB_HOST']
-            dp_port = app.config['VOCABULARY_DB_PORT']
-            dp_name = app.config['VOCABULARY_DB_NAME']
-            db_user = app.config['VOCABULARY_DB_USER']
-            db_password = app.config['VOCABULARY_DB_PASSWORD']
-            full_import_command = f"solr/{ATHENA_CORE_NAME}/dataimport?command=full-import" \
-                                  f"&jdbcurl=jdbc:postgresql://{db_host}:{dp_port}/{dp_name}" \
-                                  f"&jdbcuser={db_user}" \
-                                  f"&jdbcpassword={db_password}"
-            result = run_solr_command(full_import_command)
-            logger.info("Run solr data import command with result %s", result)
+        return
+    if not _index_lock.acquire(blocking=False):
+        logger.info("The import data process has already started")
+        return
+    try:
+        index_athena_concepts(logger)
+    finally:
+        _index_lock.release()
+
+
+def index_athena_concepts(logger):
+    """Stream vocabulary concepts by a server-side cursor and post them to the athena core by parallel workers"""
+    indexer = SolrIndexer(get_solr(ATHENA_CORE_NAME),
+                          ATHENA_CORE_NAME,
+                          workers=app.config.get('SOLR_INDEX_WORKERS', SOLR_INDEX_WORKERS),
+                          batch_size=app.config.get('SOLR_INDEX_BATCH_SIZE', SOLR_INDEX_BATCH_SIZE),
+                          soft_commit_interval=app.config.get('SOLR_INDEX_SOFT_COMMIT_INTERVAL',
+                                                              SOLR_INDEX_SOFT_COMMIT_INTERVAL),
+                          progress_interval=app.config.get('SOLR_INDEX_PROGRESS_INTERVAL',
+                                                           SOLR_INDEX_PROGRESS_INTERVAL),
+                          logger=logger)
+    connection = psycopg2.connect(host=app.config['VOCABULARY_DB_HOST'],
+                                  port=app.config['VOCABULARY_DB_PORT'],
+                                  dbname=app.config['VOCABULARY_DB_NAME'],
+                                  user=app.config['VOCABULARY_DB_USER'],
+                                  password=app.config['VOCABULARY_DB_PASSWORD'])
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM vocabulary.concept')
+            total = cursor.fetchone()[0]
+        rows = iterate_rows(connection, ATHENA_INDEX_QUERY,
+                            app.config.get('SOLR_INDEX_FETCH_SIZE', SOLR_INDEX_FETCH_SIZE))
+        progress = indexer.index((row_to_document(row) for row in rows), total)
+    finally:
+        connection.close()
+    logger.info(f"Athena Solr data imported: {progress.done} documents in {progress.elapsed:.0f}s")
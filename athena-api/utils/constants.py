@@ -1,5 +1,3 @@
-from app import app
-
 VOCABULARY_FILTERS = {
     'concept_class_id': 'conceptClass',
     'domain_id': 'domain',
@@ -10,4 +8,16 @@ VOCABULARY_FILTERS = {
 
 ATHENA_CORE_NAME = 'athena'
 
-SOLR_CONN_STRING = f"{app.config['SOLR_URL']}/solr/{ATHENA_CORE_NAME}"
+# Defaults, can be overridden by app config keys with the same names
+SOLR_TIMEOUT = 30
+SOLR_RETRIES = 3
+SOLR_RETRY_BACKOFF_FACTOR = 0.3
+SOLR_POOL_SIZE = 20
+
+# Solr indexing of vocabulary concepts: parallel update workers, documents per update request,
+# rows fetched from the server-side cursor at once, seconds between soft commits and between progress logs
+SOLR_INDEX_WORKERS = 4
+SOLR_INDEX_BATCH_SIZE = 5000
+SOLR_INDEX_FETCH_SIZE = 20000
+SOLR_INDEX_SOFT_COMMIT_INTERVAL = 60
+SOLR_INDEX_PROGRESS_INTERVAL = 30
@@ -0,0 +1,44 @@
+import threading
+
+import pysolr
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app import app
+from utils.constants import ATHENA_CORE_NAME, SOLR_TIMEOUT, SOLR_RETRIES, SOLR_RETRY_BACKOFF_FACTOR, SOLR_POOL_SIZE
+
+# {[core_name: str]: pysolr.Solr}
+_solr_clients = {}
+_solr_clients_lock = threading.Lock()
+
+
+def _create_session() -> requests.Session:
+    """Keep-alive session with connection pool, retries with backoff on connection errors and 5xx responses"""
+    retry = Retry(total=app.config.get('SOLR_RETRIES', SOLR_RETRIES),
+                  backoff_factor=app.config.get('SOLR_RETRY_BACKOFF_FACTOR', SOLR_RETRY_BACKOFF_FACTOR),
+                  status_forcelist=[502, 503, 504],
+                  allowed_methods=['GET', 'POST'],
+                  raise_on_status=False)
+    pool_size = app.config.get('SOLR_POOL_SIZE', SOLR_POOL_SIZE)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.stream = False
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_solr(core_name: str = ATHENA_CORE_NAME) -> pysolr.Solr:
+    """Return process-wide Solr client of core. Reads do not commit"""
+    solr = _solr_clients.get(core_name)
+    if solr is None:
+        with _solr_clients_lock:
+            solr = _solr_clients.get(core_name)
+            if solr is None:
+                solr = pysolr.Solr(f"{app.config['SOLR_URL']}/solr/{core_name}",
+                                   timeout=app.config.get('SOLR_TIMEOUT', SOLR_TIMEOUT),
+                                   always_commit=False)
+                solr.session = _create_session()
+                _solr_clients[core_name] = solr
+    return solr
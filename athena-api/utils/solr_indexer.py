@@ -0,0 +1,151 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+
+def iterate_rows(connection, query: str, fetch_size: int, params=None) -> Iterator[dict]:
+    """
+    Stream rows of query as dicts by a server-side (named) cursor, at most fetch_size rows are in memory at once.
+    Named cursors live inside a transaction, so the connection must not be in autocommit mode
+    """
+    with connection.cursor(name='solr_indexer_cursor') as cursor:
+        cursor.itersize = fetch_size
+        cursor.execute(query, params)
+        columns = None
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            if columns is None:
+                columns = [column[0] for column in cursor.description]
+            for row in rows:
+                yield dict(zip(columns, row))
+
+
+def row_to_document(row: dict) -> dict:
+    """Solr document of row, NULL values are skipped as DataImportHandler does"""
+    return {key: value for key, value in row.items() if value is not None}
+
+
+def iterate_batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IndexProgress:
+    """Count of indexed documents with rate and ETA, logged at most once per interval seconds"""
+
+    def __init__(self,
+                 name: str,
+                 total: Optional[int],
+                 interval: float,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self._interval = interval
+        self._logger = logger
+        self._start_time = time.perf_counter()
+        self._logged_at = self._start_time
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start_time
+
+    @property
+    def rate(self) -> float:
+        """Indexed documents per second"""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left until all documents are indexed, None if total or rate is unknown"""
+        rate = self.rate
+        if not self.total or rate == 0:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def add(self, count: int):
+        self.done += count
+        now = time.perf_counter()
+        if now - self._logged_at >= self._interval:
+            self._logged_at = now
+            self.log()
+
+    def log(self):
+        eta = self.eta
+        total = f'/{self.total}' if self.total else ''
+        eta_message = f', ETA {eta:.0f}s' if eta is not None else ''
+        self._logger.info(f'{self.name}: indexed {self.done}{total} documents, {self.rate:.0f} docs/s{eta_message}')
+
+
+class SolrIndexer:
+    """
+    Index documents to a Solr core by batches posted by a pool of parallel update workers.
+    Added documents become visible by soft commits every soft_commit_interval seconds and by a hard commit at the end.
+    solr is a pysolr.Solr or any object with the same add, delete and commit methods, e.g. a local stand-in in tests
+    """
+
+    def __init__(self,
+                 solr,
+                 name: str,
+                 workers: int = 4,
+                 batch_size: int = 5000,
+                 soft_commit_interval: float = 60,
+                 progress_interval: float = 30,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        self.solr = solr
+        self.name = name
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.soft_commit_interval = soft_commit_interval
+        self.progress_interval = progress_interval
+        self._logger = logger
+
+    def index(self, documents: Iterable[dict], total: Optional[int] = None, clean: bool = True) -> IndexProgress:
+        """
+        Post documents and return progress with indexed documents count.
+        With clean=True all documents of the core are deleted first and new documents are added without overwrite check,
+        soft commits are skipped, so searches see the previous documents until the hard commit after all batches are added.
+        Posted batches are bounded by twice the workers count, so documents are read as fast as Solr indexes them
+        """
+        if clean:
+            self.solr.delete(q='*:*', commit=False)
+        overwrite = False if clean else None
+        soft_commit_interval = 0 if clean else self.soft_commit_interval
+        progress = IndexProgress(self.name, total, self.progress_interval, self._logger)
+        max_pending = self.workers * 2
+        last_commit_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            try:
+                for batch in iterate_batches(documents, self.batch_size):
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            progress.add(future.result())
+                    pending.add(executor.submit(self._post, batch, overwrite))
+                    if soft_commit_interval and time.perf_counter() - last_commit_time >= soft_commit_interval:
+                        self.solr.commit(softCommit=True)
+                        last_commit_time = time.perf_counter()
+                done, pending = wait(pending)
+                for future in done:
+                    progress.add(future.result())
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        self.solr.commit()
+        progress.log()
+        return progress
+
+    def _post(self, batch: List[dict], overwrite: Optional[bool]) -> int:
+        self.solr.add(batch, commit=False, overwrite=overwrite)
+        return len(batch)
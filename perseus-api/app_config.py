@@ -1,11 +1,11 @@
 import os
 from flask import Flask
-from utils.key_vaults import get_secrets
 
 
 def init_app_config(app: Flask):
     env = os.getenv("PERSEUS_ENV").capitalize()
     app.config.from_object(f'config.{env}Config')
     if app.config["AZURE_KEY_VAULT"]:
+        from utils.key_vaults import get_secrets
         app.config.from_mapping(get_secrets())
     print('App config initialized')
\ No newline at end of file
@@ -1,6 +1,7 @@
 PORT = 5000
 APP_PREFIX = '/backend'
 VERSION = 0.4
+SERVER_TIMING = False
 
 
 class LocalConfig:
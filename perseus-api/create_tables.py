@@ -1,7 +1,8 @@
 from db import app_logic_db
 from model.etl_mapping import EtlMapping
 from model.user_defined_lookup import UserDefinedLookup
+from model.user_defined_lookups_version import UserDefinedLookupsVersion
 
 
 def create_tables():
-    app_logic_db.create_tables([EtlMapping, UserDefinedLookup])
+    app_logic_db.create_tables([EtlMapping, UserDefinedLookup, UserDefinedLookupsVersion])
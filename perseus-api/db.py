@@ -1,18 +1,38 @@
+import time
+
 from peewee import PostgresqlDatabase
 
 from app import app
+from utils import metrics
+
+
+class TimedPostgresqlDatabase(PostgresqlDatabase):
+    """Records execution time of every query to the 'db' metrics histogram"""
+
+    def __init__(self, database, metrics_name: str, **kwargs):
+        super().__init__(database, **kwargs)
+        self.metrics_name = metrics_name
+
+    def execute_sql(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(*args, **kwargs)
+        finally:
+            metrics.observe(metrics.DB, self.metrics_name, time.perf_counter() - start)
 
 
-app_logic_db = PostgresqlDatabase(
+app_logic_db = TimedPostgresqlDatabase(
                                  app.config["APP_LOGIC_DB_NAME"],
+                                 'app_logic_db',
                                  user=app.config["APP_LOGIC_DB_USER"],
                                  password=app.config["APP_LOGIC_DB_PASSWORD"],
                                  host=app.config["APP_LOGIC_DB_HOST"],
                                  port=app.config["APP_LOGIC_DB_PORT"]
                                  )
 
-user_schema_db = PostgresqlDatabase(
+user_schema_db = TimedPostgresqlDatabase(
                                    app.config["USER_SCHEMAS_DB_NAME"],
+                                   'user_schema_db',
                                    user=app.config["USER_SCHEMAS_DB_USER"],
                                    password=app.config["USER_SCHEMAS_DB_PASSWORD"],
                                    host=app.config["USER_SCHEMAS_DB_HOST"],
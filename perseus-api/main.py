@@ -1,17 +1,21 @@
+from flask import request
 from waitress import serve
 
 from app import app
-from config import PORT
+from config import PORT, SERVER_TIMING
 from create_tables import create_tables
 from db import app_logic_db, user_schema_db
 from perseus_api import perseus
 from services.clear_cache_job import create_clear_cache_job
+from services.lookup_service import load_predefined_lookups
+from utils import metrics
 
 app.register_blueprint(perseus)
 
 
 @app.before_request
 def before_request():
+    metrics.start_request()
     if app_logic_db.is_closed():
         app_logic_db.connect()
     if user_schema_db.is_closed():
@@ -24,10 +28,15 @@ def after_request(response):
         app_logic_db.close()
     if not user_schema_db.is_closed():
         user_schema_db.close()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    elapsed = metrics.finish_request(route, request.method, response.status_code)
+    if SERVER_TIMING and elapsed is not None:
+        response.headers['Server-Timing'] = metrics.server_timing_header(elapsed)
     return response
 
 
 if __name__ == '__main__':
     create_tables()
     create_clear_cache_job()
+    load_predefined_lookups()
     serve(app, host='0.0.0.0', port=PORT)
@@ -13,4 +13,5 @@ class UserDefinedLookup(BaseModel):
         db_table = 'user_defined_lookups'
         indexes = (
             (('name', 'username'), True),
+            (('username', 'name'), False),
         )
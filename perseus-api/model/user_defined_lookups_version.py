@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from peewee import CharField, IntegerField, DateTimeField
+from model.base_model import BaseModel
+
+
+class UserDefinedLookupsVersion(BaseModel):
+    """Version of user lookups list, incremented by each create, update and delete of user lookup"""
+    username = CharField(primary_key=True)
+    version = IntegerField(default=0)
+    modified_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        db_table = 'user_defined_lookups_versions'
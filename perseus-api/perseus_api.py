@@ -3,7 +3,7 @@ import traceback
 from pathlib import Path
 
 from flask import Blueprint, after_this_request
-from flask import request, jsonify, send_from_directory
+from flask import request, jsonify, send_from_directory, Response
 from peewee import ProgrammingError
 from werkzeug.exceptions import BadRequestKeyError
 from app import app
@@ -21,6 +21,7 @@ from utils.constants import GENERATE_CDM_XML_ARCHIVE_PATH, \
     GENERATE_CDM_XML_ARCHIVE_FILENAME, CDM_XML_ARCHIVE_FORMAT
 from utils.exceptions import InvalidUsage
 from utils.info_response import info_response
+from utils.metrics import get_metrics
 from utils.username_header import username_header
 
 perseus = Blueprint('perseus', __name__, url_prefix=APP_PREFIX)
@@ -32,6 +33,12 @@ def get_app_version():
     return info_response()
 
 
+@perseus.route('/api/metrics', methods=['GET'])
+def get_metrics_call():
+    """return latency histograms per route, DB, files manager call and named stage"""
+    return jsonify(get_metrics())
+
+
 @perseus.route('/api/upload_scan_report', methods=['POST'])
 @username_header
 def upload_scan_report(current_user):
@@ -226,10 +233,22 @@ def get_lookup_sql():
 @perseus.route('/api/lookups')
 @username_header
 def get_lookups(current_user):
+    """return predefined and user lookups list, optionally filtered by name prefix and paged"""
     app.logger.info("REST request to get lookup list")
     lookup_type = request.args['lookupType']
-    lookups_list = lookup_service.get_lookups(lookup_type, current_user)
-    return jsonify(lookups_list)
+    name = request.args.get('name', '', str)
+    page = request.args.get('page', None, int)
+    page_size = request.args.get('pageSize', None, int)
+    etag = lookup_service.get_lookups_etag(lookup_type, current_user, name, page, page_size)
+    if request.if_none_match.contains(etag):
+        not_modified = Response(status=304)
+        not_modified.set_etag(etag)
+        return not_modified
+    lookups_list, total = lookup_service.get_lookups(lookup_type, current_user, name, page, page_size)
+    response = jsonify(lookups_list)
+    response.set_etag(etag)
+    response.headers['X-Total-Count'] = str(total)
+    return response
 
 
 @perseus.route('/api/lookup', methods=['POST'])
@@ -1,51 +1,118 @@
-from xlrd import Book
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple, TYPE_CHECKING
 from app import app
 from services.model import scan_report_cache_info
 from services.model.scan_report_cache_info import ScanReportCacheInfo
 from utils.file_util import delete_if_exist
 
+if TYPE_CHECKING:
+    from xlrd import Book
+
+LOCK_STRIPES_COUNT = 32
 
 # {[username: str]: ScanReportCacheInfo}
+# Entries of a user are read and modified only under the user lock stripe
 uploaded_scan_report_info = {}
 
+_lock_stripes = [threading.RLock() for _ in range(LOCK_STRIPES_COUNT)]
+
+
+def _get_lock(username: str) -> threading.RLock:
+    return _lock_stripes[hash(username) % LOCK_STRIPES_COUNT]
+
+
+def _release(cache_data: ScanReportCacheInfo, delete_file: bool):
+    """Release book and delete scan report file if needed. Postponed until the last reader returns the book"""
+    if cache_data.ref_count > 0:
+        cache_data.release_pending = True
+        cache_data.delete_file_pending = cache_data.delete_file_pending or delete_file
+        return
+    if cache_data.book is not None:
+        app.logger.info('Closing scan-report WORKBOOK...')
+        cache_data.book.release_resources()
+        cache_data.book = None
+    if delete_file or cache_data.delete_file_pending:
+        delete_if_exist(cache_data.scan_report_path)
+    cache_data.release_pending = False
+    cache_data.delete_file_pending = False
+
 
 def get_etl_mapping_id(username: str) -> int or None:
-    if username in uploaded_scan_report_info:
-        cache_data = uploaded_scan_report_info[username]
-        return cache_data.etl_mapping_id
-    else:
-        return None
+    with _get_lock(username):
+        cache_data = uploaded_scan_report_info.get(username)
+        return cache_data.etl_mapping_id if cache_data is not None else None
 
 
 def get_scan_report_info(username: str) -> ScanReportCacheInfo or None:
-    if username in uploaded_scan_report_info:
-        return uploaded_scan_report_info[username]
-    else:
-        return None
+    with _get_lock(username):
+        return uploaded_scan_report_info.get(username)
 
 
 def set_uploaded_scan_report_info(username: str,
                                   etl_mapping_id: int,
                                   scan_report_path: str,
-                                  book: Book or None = None):
-    if username in uploaded_scan_report_info:
-        cache_data = uploaded_scan_report_info[username]
-        if cache_data.book is not None:
-            app.logger.info('Closing scan-report WORKBOOK...')
-            cache_data.book.release_resources()
-            cache_data.book = None
-        if cache_data.scan_report_path != scan_report_path:
-            delete_if_exist(cache_data.scan_report_path)
-
+                                  book: Optional['Book'] = None) -> ScanReportCacheInfo:
     new_data = scan_report_cache_info.create(etl_mapping_id, scan_report_path, book)
-    uploaded_scan_report_info[username] = new_data
+    with _get_lock(username):
+        cache_data = uploaded_scan_report_info.get(username)
+        if cache_data is not None:
+            same_file = cache_data.scan_report_path == scan_report_path
+            if same_file:
+                cache_data.delete_file_pending = False
+            _release(cache_data, delete_file=not same_file)
+        uploaded_scan_report_info[username] = new_data
+    return new_data
+
+
+@contextmanager
+def acquire_book(username: str, etl_mapping_id: int, open_book: Callable[[], Tuple['Book', str]]):
+    """
+    Yield cached scan report book of user or open it by open_book, which returns book and scan report path.
+    The book is not released by other requests or by the clear cache job until it is returned
+    """
+    lock = _get_lock(username)
+    with lock:
+        cache_data = uploaded_scan_report_info.get(username)
+        if cache_data is None \
+                or cache_data.book is None \
+                or cache_data.release_pending \
+                or cache_data.etl_mapping_id != etl_mapping_id:
+            cache_data = None
+        else:
+            cache_data.ref_count += 1
+            cache_data.date_time = datetime.now()
+    if cache_data is None:
+        # Open outside the lock, opening a workbook can take seconds
+        book, scan_report_path = open_book()
+        with lock:
+            cache_data = set_uploaded_scan_report_info(username, etl_mapping_id, scan_report_path, book)
+            cache_data.ref_count += 1
+    try:
+        yield cache_data.book
+    finally:
+        with lock:
+            cache_data.ref_count -= 1
+            if cache_data.ref_count == 0 and cache_data.release_pending:
+                _release(cache_data, delete_file=False)
 
 
 def release_resource_if_used(username: str):
-    if username in uploaded_scan_report_info:
-        cache_data = uploaded_scan_report_info[username]
-        if cache_data.book is not None:
-            app.logger.info('Closing scan-report WORKBOOK...')
-            cache_data.book.release_resources()
-            cache_data.book = None
-        delete_if_exist(cache_data.scan_report_path)
\ No newline at end of file
+    with _get_lock(username):
+        cache_data = uploaded_scan_report_info.get(username)
+        if cache_data is not None:
+            _release(cache_data, delete_file=True)
+
+
+def release_if_expired(username: str, expiration: timedelta) -> bool:
+    """Remove user cache entry if it was not used for expiration time. Return True if removed"""
+    with _get_lock(username):
+        cache_data = uploaded_scan_report_info.get(username)
+        if cache_data is None or cache_data.ref_count > 0:
+            return False
+        if datetime.now() - cache_data.date_time < expiration:
+            return False
+        _release(cache_data, delete_file=True)
+        del uploaded_scan_report_info[username]
+        return True
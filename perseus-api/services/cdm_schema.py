@@ -1,4 +1,3 @@
-import pandas as pd
 from pathlib import Path
 
 from utils import CDM_SCHEMA_PATH, CDM_VERSION_LIST
@@ -12,6 +11,7 @@ def get_exist_version():
 
 def get_schema(cdm_version):
     """load CDM schema from csv"""
+    import pandas as pd
     schema = []
     if cdm_version in CDM_VERSION_LIST:
         path = Path(CDM_SCHEMA_PATH / ('CDMv' + cdm_version + '.csv'))
@@ -1,14 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from app import app
 from services import cache_service
-from services.model.scan_report_cache_info import ScanReportCacheInfo
-from utils.file_util import delete_if_exist
 
 job_scheduler = BackgroundScheduler(timezone='UTC')
 job_id = 'clear_cache'
+CACHE_EXPIRATION = timedelta(minutes=25)
 
 
 def create_clear_cache_job():
@@ -17,17 +16,7 @@ def create_clear_cache_job():
 
 
 def clear_cache():
-    cache = cache_service.uploaded_scan_report_info
-    for key in cache:
-        cache_data: ScanReportCacheInfo = cache[key]
-        current_time = datetime.now()
-        delta: timedelta = current_time - cache_data.date_time
-        seconds = delta.total_seconds()
-        minutes = (seconds % 3600) // 60
-        if minutes >= 25:
-            if cache_data.book is not None:
-                app.logger.info('Closing scan-report WORKBOOK...')
-                cache_data.book.release_resources()
-                cache_data.book = None
-                app.logger.info(f"Released resources for user \'{key}\'")
-            delete_if_exist(cache_data.scan_report_path)
+    # Iterate over keys snapshot, each entry is checked under its own user lock
+    for username in list(cache_service.uploaded_scan_report_info):
+        if cache_service.release_if_expired(username, CACHE_EXPIRATION):
+            app.logger.info(f"Released resources for user \'{username}\'")
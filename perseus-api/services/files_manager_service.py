@@ -6,6 +6,7 @@ from services.response.file_save_reponse import FileSaveResponse
 from utils import InvalidUsage
 from services.response import file_save_reponse
 from utils.constants import SCAN_REPORT_DATA_KEY
+from utils.metrics import timer, HTTP
 
 FILE_MANAGER_URL = app.config["FILE_MANAGER_API_URL"]
 
@@ -13,7 +14,8 @@ FILE_MANAGER_URL = app.config["FILE_MANAGER_API_URL"]
 def get_file(data_id: int) -> bytes:
     app.logger.info('INTERNAL request to get file via File Manager')
     url = f'{FILE_MANAGER_URL}/api/{data_id}'
-    r = requests.get(url)
+    with timer('files_manager.get_file', HTTP):
+        r = requests.get(url)
     if r.status_code == 200:
         return r.content
     else:
@@ -32,7 +34,8 @@ def save_file(username: str,
     with open(file_path, 'rb') as file:
         files = {'file': (filename, file, content_type)}
         values = {'username': username, 'dataKey': SCAN_REPORT_DATA_KEY}
-        r = requests.post(url=url, files=files, data=values, verify=False)
+        with timer('files_manager.save_file', HTTP):
+            r = requests.post(url=url, files=files, data=values, verify=False)
         if r.status_code == 200:
             json_result = json.loads(r.content.decode('utf-8'))
             return file_save_reponse.from_json(json_result)
@@ -1,35 +1,119 @@
+import hashlib
 import os
+import threading
+from bisect import bisect_left
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
+from db import app_logic_db
 from model.user_defined_lookup import UserDefinedLookup as Lookup
+from model.user_defined_lookups_version import UserDefinedLookupsVersion as LookupsVersion
 from services.request.lookup_request import LookupRequest
 from services.response.lookup_list_item_response import LookupListItemResponse
 from utils import InvalidUsage
 from utils.constants import PREDEFINED_LOOKUPS_PATH, GENERATE_LOOKUP_SQL_PATH
 from utils.exceptions import LookupNotFoundById
 
+# Predefined lookups catalog: {[lookup_type: str]: (directory mtime, names, lower case names)}, sorted by lower case
+_predefined_lookups = {}
+_predefined_lookups_lock = threading.Lock()
 
-def get_lookups(lookup_type: str, username: str) -> List[LookupListItemResponse]:
-    lookups_names_list = []
 
-    def extract_lookups_from_server_directory(base_path):
-        path = os.path.join(base_path, lookup_type)
-        if os.path.isdir(path):
-            files = os.listdir(path)
-            lookups_names_list.extend(
-                map(lambda x: LookupListItemResponse(id=None, name=f"{x.replace('.txt', '')}"), files)
-            )
+def load_predefined_lookups():
+    """Index predefined lookups of all types, called on startup"""
+    if os.path.isdir(PREDEFINED_LOOKUPS_PATH):
+        for lookup_type in os.listdir(PREDEFINED_LOOKUPS_PATH):
+            if os.path.isdir(os.path.join(PREDEFINED_LOOKUPS_PATH, lookup_type)):
+                _get_predefined_lookups_names(lookup_type)
 
-    def extract_lookups_from_database():
-        select_query = Lookup.select().where(Lookup.username == username)
+
+def _get_predefined_lookups_names(lookup_type: str) -> Tuple[List[str], List[str]]:
+    """Return indexed predefined lookups names, re-index directory when its modification time is changed"""
+    path = os.path.join(PREDEFINED_LOOKUPS_PATH, lookup_type)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except (FileNotFoundError, NotADirectoryError):
+        mtime = None
+    indexed = _predefined_lookups.get(lookup_type)
+    if indexed is not None and indexed[0] == mtime:
+        return indexed[1], indexed[2]
+    with _predefined_lookups_lock:
+        names = sorted((file.replace('.txt', '') for file in os.listdir(path)), key=str.lower) \
+            if mtime is not None and os.path.isdir(path) \
+            else []
+        lower_names = [name.lower() for name in names]
+        _predefined_lookups[lookup_type] = (mtime, names, lower_names)
+        return names, lower_names
+
+
+def get_lookups_etag(lookup_type: str, username: str, name_prefix: str, page: int or None, page_size: int or None) -> str:
+    """
+    ETag of lookups list built from predefined lookups directory mtime and the user lookups version row,
+    so it costs one directory stat and one primary key read whatever the number of lookups is.
+    The version is stored in DB, so the ETag changes when lookups are modified by another process
+    """
+    _get_predefined_lookups_names(lookup_type)
+    predefined_mtime = _predefined_lookups[lookup_type][0]
+    version = LookupsVersion.get_or_none(LookupsVersion.username == username)
+    user_lookups_version = f'{version.version}:{version.modified_at.isoformat()}' if version is not None else '0'
+    key = f'{predefined_mtime}:{user_lookups_version}:' \
+          f'{lookup_type}:{username}:{name_prefix}:{page}:{page_size}'
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def _increment_user_lookups_version(username: str):
+    """Called in the transaction of each user lookup change"""
+    now = datetime.now()
+    LookupsVersion.insert(username=username, version=1, modified_at=now).on_conflict(
+        conflict_target=[LookupsVersion.username],
+        update={LookupsVersion.version: LookupsVersion.version + 1, LookupsVersion.modified_at: now}
+    ).execute()
+
+
+def get_lookups(lookup_type: str,
+                username: str,
+                name_prefix: str = '',
+                page: int or None = None,
+                page_size: int or None = None) -> Tuple[List[LookupListItemResponse], int]:
+    """
+    Return predefined lookups followed by user lookups, which names start with name_prefix (case insensitive),
+    and total count of found lookups. Page numbers start from 1, all lookups returned if page is not set
+    """
+    predefined_names, lower_names = _get_predefined_lookups_names(lookup_type)
+    if name_prefix:
+        prefix = name_prefix.lower()
+        start = bisect_left(lower_names, prefix)
+        # All names with the prefix sort before the prefix followed by the max code point
+        end = bisect_left(lower_names, prefix + chr(0x10FFFF), lo=start)
+        predefined_names = predefined_names[start:end]
+
+    user_lookups_query = Lookup.select(Lookup.id, Lookup.name).where(Lookup.username == username)
+    if name_prefix:
+        user_lookups_query = user_lookups_query.where(Lookup.name.startswith(name_prefix))
+    user_lookups_query = user_lookups_query.order_by(Lookup.name)
+
+    if page is None or page_size is None:
+        lookups_names_list = [LookupListItemResponse(id=None, name=name) for name in predefined_names]
         lookups_names_list.extend(
-            [LookupListItemResponse(id=lookup.id, name=lookup.name) for lookup in select_query]
+            [LookupListItemResponse(id=lookup.id, name=lookup.name) for lookup in user_lookups_query]
         )
+        return lookups_names_list, len(lookups_names_list)
+
+    if page < 1 or page_size < 1:
+        raise InvalidUsage('Page and page size must be positive numbers', 400)
+    offset = (page - 1) * page_size
+    lookups_names_list = [LookupListItemResponse(id=None, name=name)
+                          for name in predefined_names[offset:offset + page_size]]
+    user_offset = max(0, offset - len(predefined_names))
+    user_limit = page_size - len(lookups_names_list)
+    if user_limit > 0:
+        lookups_names_list.extend(
+            [LookupListItemResponse(id=lookup.id, name=lookup.name)
+             for lookup in user_lookups_query.offset(user_offset).limit(user_limit)]
+        )
+    total = len(predefined_names) + user_lookups_query.count()
 
-    extract_lookups_from_server_directory(PREDEFINED_LOOKUPS_PATH)
-    extract_lookups_from_database()
-
-    return lookups_names_list
+    return lookups_names_list, total
 
 
 def get_lookup_by_id(id: int) -> Lookup:
@@ -73,7 +157,9 @@ def create_lookup(username: str, lookup_request: LookupRequest) -> Lookup:
         source_to_standard=lookup_request.source_to_standard,
         source_to_source=lookup_request.source_to_source
     )
-    lookup.save()
+    with app_logic_db.atomic():
+        lookup.save()
+        _increment_user_lookups_version(username)
 
     return lookup
 
@@ -86,7 +172,9 @@ def update_lookup(username: str, id: int, lookup_request: LookupRequest) -> Look
         else:
             lookup.source_to_standard = lookup_request.source_to_standard
             lookup.source_to_source = lookup_request.source_to_source
-            lookup.save()
+            with app_logic_db.atomic():
+                lookup.save()
+                _increment_user_lookups_version(username)
 
             return lookup
     except IndexError as e:
@@ -97,7 +185,9 @@ def del_lookup(username: str, lookup_id: int):
     lookup: Lookup = Lookup.get(Lookup.id == lookup_id)
     if username != lookup.username:
         raise InvalidUsage('Can not delete lookup entity owned other user', 403)
-    lookup.delete_instance()
+    with app_logic_db.atomic():
+        lookup.delete_instance()
+        _increment_user_lookups_version(username)
 
 
 def generate_lookup_file(lookup_json: dict, username: str):
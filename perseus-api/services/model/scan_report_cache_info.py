@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
-from xlrd import Book
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from xlrd import Book
 
 
 @dataclass
@@ -8,14 +11,18 @@ class ScanReportCacheInfo:
     etl_mapping_id: int
     date_time: datetime
     scan_report_path: str
-    book: Book or None
+    book: Optional['Book']
+    # Count of requests currently reading the book
+    ref_count: int = 0
+    # Book will be released (and file deleted if set) when last reader returns it
+    release_pending: bool = False
+    delete_file_pending: bool = False
 
 
-def create(etl_mapping_id: int, scan_report_path: str, book: Book or None = None):
+def create(etl_mapping_id: int, scan_report_path: str, book: Optional['Book'] = None):
     return ScanReportCacheInfo(
         etl_mapping_id=etl_mapping_id,
         date_time=datetime.now(),
         scan_report_path=scan_report_path,
         book=book
     )
-
@@ -1,10 +1,7 @@
 import re
 
-import xlrd
-import pandas as pd
 from itertools import groupby
 from pathlib import Path
-from pandasql import sqldf
 from app import app
 from db import user_schema_db
 from model.etl_mapping import EtlMapping
@@ -16,6 +13,7 @@ from utils.constants import UPLOAD_SCAN_REPORT_FOLDER, COLUMN_TYPES_MAPPING,\
                             TYPES_WITH_MAX_LENGTH, LIST_OF_COLUMN_INFO_FIELDS,\
                             N_ROWS_FIELD_NAME, N_ROWS_CHECKED_FIELD_NAME
 from utils.exceptions import InvalidUsage
+from utils.metrics import timer
 from utils.sql_util import select_all_schemas_from_source_table, select_user_tables
 from utils.view_sql_util import is_sql_safety
 from view.Table import Table, Column
@@ -34,10 +32,15 @@ def create_source_schema_by_scan_report(username: str, etl_mapping_id: int, scan
 
 def _create_source_schema_by_scan_report(username: str, etl_mapping_id: int, scan_report_path: Path):
     """Create source schema by White Rabbit scan report and return it. Cast to postgres types"""
-    reset_schema(name=username)
+    import xlrd
+    import pandas as pd
+    from pandasql import sqldf
+    with timer('create_source_schema.reset_schema'):
+        reset_schema(name=username)
     try:
         app.logger.info('Opening scan report WORKBOOK...')
-        book = xlrd.open_workbook(scan_report_path, on_demand=True)
+        with timer('create_source_schema.open_workbook'):
+            book = xlrd.open_workbook(scan_report_path, on_demand=True)
     except Exception as e:
         raise InvalidUsage(f"Could not open scan report file: {e.__str__()}", 400, base=e)
     if book.nsheets > MAX_TABLES + OVERVIEW_SHEET_COUNT:
@@ -47,11 +50,13 @@ def _create_source_schema_by_scan_report(username: str, etl_mapping_id: int, sca
 
     try:
         # always take the first sheet of the excel file
-        overview = pd.read_excel(book, dtype=str, na_filter=False, engine='xlrd')
+        with timer('create_source_schema.read_overview'):
+            overview = pd.read_excel(book, dtype=str, na_filter=False, engine='xlrd')
 
-        tables_pd = sqldf(
-            """select `table`, group_concat(field || ':' || type || ':' || "Max length", ';') as fields
-             from overview group by `table`;""")
+        with timer('create_source_schema.group_tables'):
+            tables_pd = sqldf(
+                """select `table`, group_concat(field || ':' || type || ':' || "Max length", ';') as fields
+                 from overview group by `table`;""")
         tables_pd = tables_pd[tables_pd.Table != '']
         if tables_pd.shape[0] > MAX_TABLES:
             raise InvalidUsage(f'Scan report too big. Max tables count is {MAX_TABLES}!')
@@ -80,7 +85,8 @@ def _create_source_schema_by_scan_report(username: str, etl_mapping_id: int, sca
                 create_table_sql += create_column_sql
             create_table_sql = create_table_sql.rstrip(',')
             create_table_sql += ' );'
-            user_schema_db.execute_sql(create_table_sql)
+            with timer('create_source_schema.create_tables'):
+                user_schema_db.execute_sql(create_table_sql)
             schema.append(table_)
 
         cache_service.set_uploaded_scan_report_info(username, etl_mapping_id, str(scan_report_path), book)
@@ -190,34 +196,29 @@ def run_sql_transformation(current_user, sql_transformation):
         transformation_cursor = user_schema_db.execute_sql(parsed_sql).description
 
 
-def _open_book(current_user, etl_mapping: EtlMapping):
+def _open_book(etl_mapping: EtlMapping):
+    import xlrd
     scan_report_path = get_scan_report_path(etl_mapping)
     app.logger.info('Opening scan report WORKBOOK...')
     book = xlrd.open_workbook(Path(scan_report_path), on_demand=True)
-    cache_service.set_uploaded_scan_report_info(current_user, etl_mapping.id, str(scan_report_path), book)
-
-    return book
 
-
-def _get_or_open_book(current_user, etl_mapping: EtlMapping):
-    opened_report_data = cache_service.get_scan_report_info(current_user)
-    if opened_report_data is None \
-            or opened_report_data.book is None \
-            or opened_report_data.etl_mapping_id != etl_mapping.id:
-        return _open_book(current_user, etl_mapping)
-    else:
-        return opened_report_data.book
+    return book, str(scan_report_path)
 
 
 def get_column_info(current_user, etl_mapping_id, table_name, column_name=None):
     """return top 10 values be freq for target table and/or column"""
+    import xlrd
+    import pandas as pd
+    from pandasql import sqldf
     current_etl_mapping: EtlMapping = etl_mapping_service.find_by_id(etl_mapping_id, current_user)
     try:
-        book = _get_or_open_book(current_user, current_etl_mapping)
-        table_overview = pd.read_excel(book, table_name, dtype=str,
-                                       na_filter=False,
-                                       engine='xlrd')
-        overview = pd.read_excel(book, dtype=str, na_filter=False, engine='xlrd')
+        with cache_service.acquire_book(current_user,
+                                        current_etl_mapping.id,
+                                        lambda: _open_book(current_etl_mapping)) as book:
+            table_overview = pd.read_excel(book, table_name, dtype=str,
+                                           na_filter=False,
+                                           engine='xlrd')
+            overview = pd.read_excel(book, dtype=str, na_filter=False, engine='xlrd')
         sql = f"select * from overview where `table`=='{table_name}' and `field`=='{column_name}'"
         tables_pd = sqldf(sql)._series
     except xlrd.biffh.XLRDError as e:
@@ -1,16 +1,15 @@
 import math
 import os
-import re
-import pandas as pd
 import zipfile
 
 from itertools import groupby
 from shutil import rmtree
 from pathlib import Path
-from db import user_schema_db
 from services import lookup_service
-from utils import InvalidUsage
+from utils import InvalidUsage, view_sql_util
 from utils.exceptions import LookupNotFoundById
+from utils.metrics import timer
+from utils.sql_util import select_user_tables
 from utils.similar_names_map import similar_names_map
 from utils.constants import GENERATE_ETL_XML_PATH,\
                             GENERATE_CDM_XML_ARCHIVE_PATH,\
@@ -21,7 +20,6 @@ from utils.constants import GENERATE_ETL_XML_PATH,\
                             INCOME_LOOKUPS_PATH,\
                             GENERATE_BATCH_SQL_PATH
 from xml.etree.ElementTree import Element, SubElement, tostring, ElementTree
-from xml.dom import minidom
 
 
 def _convert_underscore_to_camel(word: str):
@@ -36,6 +34,7 @@ def _replace_with_similar_name(name: str):
 
 def _prettify(elem):
     """Return a pretty-printed XML string for the Element."""
+    from xml.dom import minidom
     raw_string = tostring(elem, 'utf-8')
     reparsed = minidom.parseString(raw_string)
     return reparsed.toprettyxml(indent="  ")
@@ -68,6 +67,7 @@ def unique(sequence):
 
 def prepare_sql(current_user, mapping_items, source_table, views, target_tables):
     """prepare sql from mapping json"""
+    import pandas as pd
     required_fields = ['source_field', 'sql_field', 'sql_alias', 'targetCloneName', 'concept_id', 'sqlTransformation']
 
     def get_sql_data_items(mapping_items_, source_table_):
@@ -145,8 +145,8 @@ def prepare_sql(current_user, mapping_items, source_table, views, target_tables)
         view = views.get(source_table, None)
 
     if view:
-        view = add_schema_names(
-            'SELECT table_name FROM information_schema.tables WHERE table_schema=\'{0}\''.format(current_user), view)
+        with timer('get_xml.add_schema_names'):
+            view = view_sql_util.add_schema_names('{sc}', view, select_user_tables(current_user))
         sql = f'WITH {source_table} AS (\n{view})\n{sql}FROM {source_table}'
     else:
         sql += 'FROM {sc}.' + source_table
@@ -157,26 +157,6 @@ def prepare_sql(current_user, mapping_items, source_table, views, target_tables)
     return sql
 
 
-# method adds {sc} to table names used in join and from clauses avoiding those cases when words similar to table names areinside double/single quotes
-def add_schema_names(sql, view_sql):
-    cursor = user_schema_db.execute_sql(sql)
-    for row in cursor.fetchall():
-        view_sql = re.sub(
-            f"(?i)join {row[0]} (?!(?=[^(\'|\")]*\"[^(\'|\")]*(?:(\'|\")[^(\'|\")]*(\'|\")[^(\'|\")]*)*$))",
-            f'join {{sc}}.{row[0]} ', view_sql)
-        view_sql = re.sub(
-            f"(?i)from {row[0]} (?!(?=[^(\'|\")]*\"[^(\'|\")]*(?:(\'|\")[^(\'|\")]*(\'|\")[^(\'|\")]*)*$))",
-            f'from {{sc}}.{row[0]} ', view_sql)
-        view_sql = re.sub(
-            f"(?i)join {row[0]}\)(?!(?=[^(\'|\")]*\"[^(\'|\")]*(?:(\'|\")[^(\'|\")]*(\'|\")[^(\'|\")]*)*$))",
-            f'join {{sc}}.{row[0]})', view_sql)
-        view_sql = re.sub(
-            f"(?i)from {row[0]}\)(?!(?=[^(\'|\")]*\"[^(\'|\")]*(?:(\'|\")[^(\'|\")]*(\'|\")[^(\'|\")]*)*$))",
-            f'from {{sc}}.{row[0]})', view_sql)
-
-    return view_sql
-
-
 def create_user_directory(path, username):
     directory = Path(path, username)
     if not directory.is_dir():
@@ -272,7 +252,7 @@ def generate_bath_sql_file(current_user, mapping, source_table, views):
         view = views.get(source_table, None)
 
     if view:
-        view = view.replace('from ', 'from {sc}.').replace('join ', 'join {sc}.')
+        view = view_sql_util.qualify_table_names(view, '{sc}', None)
         sql = f'WITH {source_table} AS (\n{view})\n{sql}'
         sql += '{table} ORDER BY 1'
     else:
@@ -309,21 +289,24 @@ def clear(username: str):
 
 
 def get_xml(current_user, json_):
+    import pandas as pd
     clear(current_user)
     result = {}
     previous_target_table = ''
     previous_source_table = ''
     domain_tag = ''
-    mapping_items = pd.DataFrame(json_['mapping_items'])
-    source_tables = pd.unique(mapping_items.get('source_table'))
+    with timer('get_xml.read_mapping'):
+        mapping_items = pd.DataFrame(json_['mapping_items'])
+        source_tables = pd.unique(mapping_items.get('source_table'))
     views = json_.get('views', None)
 
     for source_table in source_tables:
         query_definition_tag = Element('QueryDefinition')
         query_tag = SubElement(query_definition_tag, 'Query')
         target_tables = mapping_items.loc[mapping_items['source_table'] == source_table].fillna('')
-        sql = prepare_sql(current_user, mapping_items, source_table, views,
-                          pd.unique(target_tables.get('target_table')))
+        with timer('get_xml.prepare_sql'):
+            sql = prepare_sql(current_user, mapping_items, source_table, views,
+                              pd.unique(target_tables.get('target_table')))
         query_tag.text = sql
 
         skip_write_file = False
@@ -382,17 +365,18 @@ def get_xml(current_user, json_):
                             is_legacy_lookup = True
 
                         if lookup_name not in generated_lookups_names:
-                            if is_legacy_lookup:
-                                lookup_service.generate_lookup_file_legacy(lookup_name, current_user)
-                            else:
-                                try:
-                                    lookup_service.generate_lookup_file(lookup_data, current_user)
-                                except LookupNotFoundById as e:
-                                    source_field = row.get('source_field', None)
-                                    raise InvalidUsage(f'{e.message}\n'
-                                                       f'Please, change \'{lookup_name}\' lookup '
-                                                       f'for {source_table} - {target_table} tables '
-                                                       f'and {source_field} - {target_field} fields', base=e)
+                            with timer('get_xml.generate_lookups'):
+                                if is_legacy_lookup:
+                                    lookup_service.generate_lookup_file_legacy(lookup_name, current_user)
+                                else:
+                                    try:
+                                        lookup_service.generate_lookup_file(lookup_data, current_user)
+                                    except LookupNotFoundById as e:
+                                        source_field = row.get('source_field', None)
+                                        raise InvalidUsage(f'{e.message}\n'
+                                                           f'Please, change \'{lookup_name}\' lookup '
+                                                           f'for {source_table} - {target_table} tables '
+                                                           f'and {source_field} - {target_field} fields', base=e)
 
                             concepts_tag = prepare_concepts_tag(
                                 concept_tags,
@@ -466,7 +450,8 @@ def get_xml(current_user, json_):
                 previous_target_table = target_table
                 previous_source_table = source_table
                 if target_table == 'person':
-                    generate_bath_sql_file(current_user, groupList, source_table, views)
+                    with timer('get_xml.generate_batch_sql'):
+                        generate_bath_sql_file(current_user, groupList, source_table, views)
 
                 if target_table.lower() in ('location', 'care_site', 'provider'):
                     skip_write_file = True
@@ -569,10 +554,11 @@ def apply_sql_transformation_to_text(sql_transformation: str,
 
 
 def write_xml(current_user, tag, filename, result):
-    xml = ElementTree(tag)
-    create_user_directory(GENERATE_ETL_XML_PATH, current_user)
-    xml.write(GENERATE_ETL_XML_PATH / current_user / (filename + '.xml'))
-    result.update({filename: _prettify(tag)})
+    with timer('get_xml.write_xml'):
+        xml = ElementTree(tag)
+        create_user_directory(GENERATE_ETL_XML_PATH, current_user)
+        xml.write(GENERATE_ETL_XML_PATH / current_user / (filename + '.xml'))
+        result.update({filename: _prettify(tag)})
 
 
 def add_files_to_zip(zip_file, path: Path, directory: str):
@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+# Budget for importing the API module in a fresh interpreter, override by PERSEUS_IMPORT_TIME_BUDGET env variable
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv('PERSEUS_IMPORT_TIME_BUDGET', '2.0'))
+HEAVY_MODULES = ['pandas', 'pandasql', 'sqlalchemy', 'xlrd', 'xml.dom.minidom', 'azure.identity']
+
+PROJECT_DIRECTORY = Path(__file__).resolve().parent.parent
+
+RESULT_MARKER = 'IMPORT_TIME_RESULT '
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import perseus_api
+elapsed = time.perf_counter() - start
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print({RESULT_MARKER!r} + json.dumps({{'elapsed': elapsed, 'heavy_modules': loaded}}))
+"""
+
+
+class ImportTimeTest(unittest.TestCase):
+    def _import_api(self):
+        env = dict(os.environ)
+        env.setdefault('PERSEUS_ENV', 'local')
+        result = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT],
+                                cwd=PROJECT_DIRECTORY,
+                                env=env,
+                                capture_output=True,
+                                text=True)
+        self.assertEqual(0, result.returncode, result.stderr)
+        # The API module can print its own lines on import, the result is the marked line
+        result_lines = [line for line in result.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+        self.assertEqual(1, len(result_lines), result.stdout)
+        data = json.loads(result_lines[0][len(RESULT_MARKER):])
+        return data['elapsed'], data['heavy_modules']
+
+    def test_heavy_modules_not_imported_on_startup(self):
+        _, loaded_heavy_modules = self._import_api()
+        self.assertEqual([], loaded_heavy_modules)
+
+    def test_import_time_budget(self):
+        elapsed, _ = self._import_api()
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET_SECONDS,
+                        f'perseus_api import took {elapsed:.2f}s, budget is {IMPORT_TIME_BUDGET_SECONDS}s')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import threading
+import unittest
+from datetime import timedelta
+
+from services import cache_service
+
+
+class FakeBook:
+    def __init__(self):
+        self.released = False
+
+    def release_resources(self):
+        self.released = True
+
+
+class CacheServiceTest(unittest.TestCase):
+    username = 'cache_service_test'
+
+    def tearDown(self):
+        cache_service.uploaded_scan_report_info.pop(self.username, None)
+
+    def test_book_not_released_while_in_use(self):
+        book = FakeBook()
+        cache_service.set_uploaded_scan_report_info(self.username, 1, 'not_exist.xlsx', book)
+
+        with cache_service.acquire_book(self.username, 1, lambda: self.fail('Book must be taken from cache')) as b:
+            cache_service.release_resource_if_used(self.username)
+            self.assertFalse(b.released)
+            self.assertFalse(cache_service.release_if_expired(self.username, timedelta(0)))
+
+        self.assertTrue(book.released)
+
+    def test_concurrent_acquire(self):
+        cache_service.set_uploaded_scan_report_info(self.username, 1, 'not_exist.xlsx', FakeBook())
+        errors = []
+
+        def read():
+            for _ in range(100):
+                with cache_service.acquire_book(self.username, 1, lambda: (FakeBook(), 'not_exist.xlsx')) as b:
+                    if b.released:
+                        errors.append('Released book returned')
+                cache_service.release_resource_if_used(self.username)
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+from peewee import SqliteDatabase
+
+from model.user_defined_lookup import UserDefinedLookup
+from model.user_defined_lookups_version import UserDefinedLookupsVersion
+from perseus_api import perseus
+from services import lookup_service
+from services.request.lookup_request import LookupRequest
+
+LOOKUP_TYPE = 'source_to_standard'
+MODELS = [UserDefinedLookup, UserDefinedLookupsVersion]
+# SQLite does not support schema-qualified indexes of peewee DDL, tables are created by plain SQL
+TABLES_SQL = [
+    'CREATE TABLE perseus.user_defined_lookups (id INTEGER PRIMARY KEY, name TEXT, username TEXT, '
+    'source_to_standard TEXT, source_to_source TEXT)',
+    'CREATE TABLE perseus.user_defined_lookups_versions (username TEXT PRIMARY KEY, version INTEGER, '
+    'modified_at DATETIME)',
+]
+
+
+class LookupServiceTest(unittest.TestCase):
+    username = 'lookup_service_test'
+
+    def setUp(self):
+        self.db = SqliteDatabase(':memory:')
+        self.db.connect()
+        self.db.execute_sql("ATTACH DATABASE ':memory:' AS perseus")
+        self.db.bind(MODELS, bind_refs=False, bind_backrefs=False)
+        for table_sql in TABLES_SQL:
+            self.db.execute_sql(table_sql)
+        self.lookups_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.lookups_dir.name, LOOKUP_TYPE))
+        lookup_service._predefined_lookups.clear()
+        patchers = [mock.patch.object(lookup_service, 'PREDEFINED_LOOKUPS_PATH', self.lookups_dir.name),
+                    mock.patch.object(lookup_service, 'app_logic_db', self.db)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        lookup_service._predefined_lookups.clear()
+        self.lookups_dir.cleanup()
+        self.db.close()
+
+    def create_predefined_lookups(self, *names: str):
+        for name in names:
+            with open(os.path.join(self.lookups_dir.name, LOOKUP_TYPE, f'{name}.txt'), 'w') as f:
+                f.write(f'select {name}')
+
+    def create_user_lookup(self, name: str) -> UserDefinedLookup:
+        return lookup_service.create_lookup(self.username, LookupRequest(name, 'select 1', 'select 2'))
+
+    def get_names(self, name_prefix='', page=None, page_size=None):
+        lookups, total = lookup_service.get_lookups(LOOKUP_TYPE, self.username, name_prefix, page, page_size)
+        return [lookup.name for lookup in lookups], total
+
+    def test_page_spans_predefined_and_user_lookups(self):
+        self.create_predefined_lookups('a1', 'B2', 'c3')
+        for name in ('d1', 'd2', 'd3'):
+            self.create_user_lookup(name)
+
+        self.assertEqual((['a1', 'B2'], 6), self.get_names(page=1, page_size=2))
+        self.assertEqual((['c3', 'd1'], 6), self.get_names(page=2, page_size=2))
+        self.assertEqual((['d2', 'd3'], 6), self.get_names(page=3, page_size=2))
+        self.assertEqual((['d3'], 6), self.get_names(page=2, page_size=5))
+        self.assertEqual(([], 6), self.get_names(page=4, page_size=2))
+        self.assertEqual((['a1', 'B2', 'c3', 'd1', 'd2', 'd3'], 6), self.get_names())
+
+    def test_case_insensitive_prefix(self):
+        self.create_predefined_lookups('Puls', 'pulse_rate', 'PULSE', 'pum', 'Pu', 'a_pulse')
+        self.create_user_lookup('Pulse_user')
+        self.create_user_lookup('temperature')
+
+        self.assertEqual((['Puls', 'PULSE', 'pulse_rate', 'Pulse_user'], 4), self.get_names('pUl'))
+        self.assertEqual((['pulse_rate', 'Pulse_user'], 4), self.get_names('pUl', page=2, page_size=2))
+        self.assertEqual(([], 0), self.get_names('pulz'))
+
+    def test_etag_changes_after_user_lookup_created_and_deleted(self):
+        self.create_predefined_lookups('a1')
+        initial_etag = lookup_service.get_lookups_etag(LOOKUP_TYPE, self.username, '', None, None)
+        self.assertEqual(initial_etag, lookup_service.get_lookups_etag(LOOKUP_TYPE, self.username, '', None, None))
+
+        lookup = self.create_user_lookup('d1')
+        created_etag = lookup_service.get_lookups_etag(LOOKUP_TYPE, self.username, '', None, None)
+        lookup_service.del_lookup(self.username, lookup.id)
+        deleted_etag = lookup_service.get_lookups_etag(LOOKUP_TYPE, self.username, '', None, None)
+
+        self.assertEqual(3, len({initial_etag, created_etag, deleted_etag}))
+
+    def test_matching_if_none_match_returns_not_modified(self):
+        self.create_predefined_lookups('a1')
+        self.create_user_lookup('d1')
+        app = Flask(__name__)
+        app.register_blueprint(perseus)
+        client = app.test_client()
+        url = f'{perseus.url_prefix}/api/lookups?lookupType={LOOKUP_TYPE}&page=1&pageSize=10'
+        headers = {'Username': self.username}
+
+        response = client.get(url, headers=headers)
+        etag = response.headers['ETag']
+        not_modified = client.get(url, headers={**headers, 'If-None-Match': etag})
+        self.create_user_lookup('d2')
+        modified = client.get(url, headers={**headers, 'If-None-Match': etag})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('2', response.headers['X-Total-Count'])
+        self.assertEqual(304, not_modified.status_code)
+        self.assertEqual(b'', not_modified.data)
+        self.assertEqual(etag, not_modified.headers['ETag'])
+        self.assertEqual(200, modified.status_code)
+        self.assertEqual([{'id': None, 'name': 'a1'}, {'id': 1, 'name': 'd1'}, {'id': 2, 'name': 'd2'}],
+                         modified.json)
+
+
+if __name__ == '__main__':
+    unittest.main()
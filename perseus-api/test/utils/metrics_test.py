@@ -0,0 +1,32 @@
+import unittest
+
+from utils import metrics
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        metrics.reset_metrics()
+
+    def test_histogram_buckets(self):
+        histogram = metrics.Histogram(buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        result = histogram.to_json()
+
+        self.assertEqual(3, result['count'])
+        self.assertEqual({'0.1': 1, '1': 1, '+Inf': 1}, result['buckets'])
+        self.assertEqual(5, result['max'])
+
+    def test_timer_outside_request(self):
+        with metrics.timer('test_stage'):
+            pass
+
+        result = metrics.get_metrics()
+
+        self.assertEqual(1, result[metrics.STAGE]['test_stage']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
-from utils.view_sql_util import start_with_select_or_with, contains_schema_names, add_schema_names
+from utils.view_sql_util import start_with_select_or_with, contains_schema_names, add_schema_names, \
+    qualify_table_names
 
 
 class ViewSqlUtilTest(unittest.TestCase):
@@ -54,6 +55,68 @@ class ViewSqlUtilTest(unittest.TestCase):
         self.assertEqual(expected_result, result2)
         self.assertEqual(expected_result, result3)
 
+    def test_add_schema_names_skips_literals_and_comments(self):
+        query = "select 'from lower' as s, \"from lower\" -- join lower\nfrom lower /* join lower */"
+        tables = ['lower']
+
+        result = add_schema_names('test', query, tables)
+
+        self.assertEqual("select 'from lower' as s, \"from lower\" -- join lower\nfrom test.lower /* join lower */",
+                         result)
+
+    def test_add_schema_names_special_table_names(self):
+        query = 'select * from "a+b(c)" join lower_2 on true, lower where x in (select 1 from lower)'
+        tables = ['a+b(c)', 'lower']
+
+        result = add_schema_names('test', query, tables)
+
+        self.assertEqual('select * from test."a+b(c)" join lower_2 on true, test.lower '
+                         'where x in (select 1 from test.lower)', result)
+
+    def test_add_schema_names_after_derived_table(self):
+        query = 'select * from (select * from person) p, visit v, (select 1) x join lower on true where a in (1, 2)'
+        tables = ['person', 'visit', 'lower']
+
+        result = add_schema_names('test', query, tables)
+
+        self.assertEqual('select * from (select * from test.person) p, test.visit v, (select 1) x '
+                         'join test.lower on true where a in (1, 2)', result)
+
+    def test_qualify_all_table_names(self):
+        query = 'select extract(year from d) from person p join test.visit v on p.id = v.id'
+
+        result = qualify_table_names(query, '{sc}', None)
+
+        self.assertEqual('select extract(year from d) from {sc}.person p join test.visit v on p.id = v.id', result)
+
+
+    def test_qualify_table_names_skips_distinct_from_operator(self):
+        query = 'select * from a join b on a.x is not distinct from b.x where a.y is distinct from y, c'
+
+        result = qualify_table_names(query, '{sc}', None)
+
+        self.assertEqual('select * from {sc}.a join {sc}.b on a.x is not distinct from b.x '
+                         'where a.y is distinct from y, c', result)
+
+    def test_qualify_table_names_skips_common_table_expressions(self):
+        query = 'with recursive c (id) as (select id from person), "D" as not materialized (select * from c) ' \
+                'select * from c, "D" d join visit v on true join (with e as (select 1) select * from e) x on true ' \
+                'where cast(v.start as timestamp with time zone) > now()'
+
+        result = qualify_table_names(query, '{sc}', None)
+
+        self.assertEqual('with recursive c (id) as (select id from {sc}.person), "D" as not materialized '
+                         '(select * from c) select * from c, "D" d join {sc}.visit v on true '
+                         'join (with e as (select 1) select * from e) x on true '
+                         'where cast(v.start as timestamp with time zone) > now()', result)
+
+    def test_qualify_table_names_with_ordinality(self):
+        query = 'select * from person, unnest(array[1]) with ordinality u, visit'
+
+        result = qualify_table_names(query, '{sc}', None)
+
+        self.assertEqual('select * from {sc}.person, unnest(array[1]) with ordinality u, {sc}.visit', result)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Upper bounds in seconds, last bucket is +Inf
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+ROUTE = 'route'
+DB = 'db'
+HTTP = 'http'
+STAGE = 'stage'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def to_json(self):
+        with self._lock:
+            buckets = {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+            buckets['+Inf'] = self.counts[-1]
+            return {
+                'count': self.count,
+                'sum': round(self.sum, 6),
+                'avg': round(self.sum / self.count, 6) if self.count else 0,
+                'max': round(self.max, 6),
+                'buckets': buckets
+            }
+
+
+# {[kind: str]: {[name: str]: Histogram}}
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def _get_histogram(kind: str, name: str) -> Histogram:
+    histograms = _histograms.get(kind)
+    if histograms is None or name not in histograms:
+        with _histograms_lock:
+            histograms = _histograms.setdefault(kind, {})
+            if name not in histograms:
+                histograms[name] = Histogram()
+    return histograms[name]
+
+
+def observe(kind: str, name: str, seconds: float):
+    """Record duration to the process-wide histogram and to the current request timings"""
+    _get_histogram(kind, name).observe(seconds)
+    if has_request_context() and 'timings' in g:
+        key = kind if kind == DB else f'{kind}.{name}'
+        g.timings[key] = g.timings.get(key, 0.0) + seconds
+
+
+@contextmanager
+def timer(name: str, kind: str = STAGE):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(kind, name, time.perf_counter() - start)
+
+
+def start_request():
+    g.timings = {}
+    g.request_start = time.perf_counter()
+
+
+def finish_request(route: str, method: str, status_code: int) -> float or None:
+    if 'request_start' not in g:
+        return None
+    elapsed = time.perf_counter() - g.request_start
+    _get_histogram(ROUTE, f'{method} {route} {status_code // 100}xx').observe(elapsed)
+    return elapsed
+
+
+def server_timing_header(total_seconds: float) -> str:
+    """Build Server-Timing header value from the current request timings, durations in milliseconds"""
+    metrics = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in g.get('timings', {}).items()]
+    metrics.append(f'total;dur={total_seconds * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+def get_metrics():
+    with _histograms_lock:
+        snapshot = {kind: dict(histograms) for kind, histograms in _histograms.items()}
+    return {kind: {name: histogram.to_json() for name, histogram in sorted(histograms.items())}
+            for kind, histograms in snapshot.items()}
+
+
+def reset_metrics():
+    with _histograms_lock:
+        _histograms.clear()
@@ -0,0 +1,39 @@
+import re
+from typing import Iterator, Tuple
+
+WHITESPACE = 'whitespace'
+COMMENT = 'comment'
+STRING = 'string'
+QUOTED_IDENTIFIER = 'quoted_identifier'
+IDENTIFIER = 'identifier'
+NUMBER = 'number'
+PUNCTUATION = 'punctuation'
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<whitespace>\s+)
+    |(?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<string>[eE]'(?:[^'\\]|\\.|'')*(?:'|\Z)
+        |'(?:[^']|'')*(?:'|\Z)
+        |\$(?P<tag>[A-Za-z_][A-Za-z0-9_]*|)\$.*?(?:\$(?P=tag)\$|\Z))
+    |(?P<quoted_identifier>"(?:[^"]|"")*(?:"|\Z))
+    |(?P<identifier>[A-Za-z_\u0080-\uffff][A-Za-z0-9_$\u0080-\uffff]*)
+    |(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+    |(?P<punctuation>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+def tokenize(sql: str) -> Iterator[Tuple[str, str]]:
+    """
+    Split SQL to (token type, token text) pairs in one pass. Joined texts of all tokens are equal to the source SQL.
+    Postgres string literals (including E'' and dollar-quoted), quoted identifiers and comments are single tokens
+    """
+    position = 0
+    length = len(sql)
+    while position < length:
+        match = _TOKEN_PATTERN.match(sql, position)
+        yield match.lastgroup, match.group()
+        position = match.end()
+
+
+def unquote_identifier(token: str) -> str:
+    return token[1:-1].replace('""', '"')
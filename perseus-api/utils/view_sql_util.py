@@ -1,10 +1,21 @@
 import re
-from typing import List
+from typing import Iterable, List, Set
 from utils import InvalidUsage
-from utils.string_util import hasCapitalLetter
+from utils.sql_tokenizer import tokenize, unquote_identifier, \
+    WHITESPACE, COMMENT, IDENTIFIER, QUOTED_IDENTIFIER, PUNCTUATION
 
+TABLE_KEYWORDS = {'from', 'join'}
+# Keywords after FROM/JOIN which do not start table name
+TABLE_MODIFIER_KEYWORDS = {'only', 'lateral'}
+FROM_CLAUSE_END_KEYWORDS = {'where', 'group', 'having', 'window', 'order', 'limit', 'offset', 'fetch', 'for',
+                            'union', 'intersect', 'except', 'select', 'returning'}
+# Functions with FROM inside arguments, e.g. extract(year from date)
+FUNCTIONS_WITH_FROM = {'extract', 'substring', 'trim', 'overlay', 'position'}
+# Keywords which end WITH clause list of common table expressions
+WITH_CLAUSE_END_KEYWORDS = {'select', 'insert', 'update', 'delete', 'values'}
 
-def is_sql_safety(sql: str, schemas: List[str]):
+
+def is_sql_safety(sql: str, schemas: Iterable[str]):
     if not start_with_select_or_with(sql):
         raise InvalidUsage('SQL must start with SELECT')
     if contains_schema_names(sql, schemas):
@@ -12,22 +23,141 @@ def is_sql_safety(sql: str, schemas: List[str]):
 
 
 def start_with_select_or_with(sql: str) -> bool:
-    return re.match('^(?i)(select|with).*', sql) is not None
+    return re.match('(?i)^(select|with).*', sql) is not None
 
 
-def contains_schema_names(sql: str, schemas: List[str]) -> bool:
+def contains_schema_names(sql: str, schemas: Iterable[str]) -> bool:
     for schema in schemas:
         if f'{schema}.' in sql or f'"{schema}".' in sql:
             return True
     return False
 
 
-def add_schema_names(username: str, view_sql: str, user_schema_tables: List[str]) -> str:
-    for table_name in user_schema_tables:
-        if hasCapitalLetter(table_name):
-            view_sql = re.sub(f'(?i)join( |\n)+"{table_name}"', f'join {username}."{table_name}"', view_sql)
-            view_sql = re.sub(f'(?i)from( |\n)+"{table_name}"', f'from {username}."{table_name}"', view_sql)
+def add_schema_names(username: str, view_sql: str, user_schema_tables: Iterable[str]) -> str:
+    return qualify_table_names(view_sql, username, set(user_schema_tables))
+
+
+def qualify_table_names(sql: str, schema: str, tables: Set[str] or None) -> str:
+    """
+    Add schema name to tables used in FROM and JOIN clauses (including comma separated FROM lists).
+    Unquoted names are matched case insensitive, quoted names exactly as Postgres does.
+    String literals, quoted identifiers, comments and already qualified names are left as is.
+    FROM of IS [NOT] DISTINCT FROM operator and names of common table expressions defined by WITH are not qualified.
+    If tables is None all tables are qualified
+    """
+    tokens = list(tokenize(sql))
+    result = []
+    depth = 0
+    # Paren levels opened by functions which use FROM keyword in arguments
+    function_depths = []
+    # Paren levels of open FROM clauses, a derived table in FROM opens a nested one
+    from_clause_depths = []
+    # Index in result of FROM/JOIN keyword, -1 for comma in FROM clause, None if table name is not expected
+    table_expected_after = None
+    # Paren levels of open WITH clauses and names of common table expressions defined by them
+    with_clause_depths = []
+    cte_name_expected = False
+    cte_names = set()
+    # Consecutive identifiers before the current token, lower case
+    previous_identifiers = []
+
+    for index, (kind, text) in enumerate(tokens):
+        if kind in (WHITESPACE, COMMENT):
+            result.append(text)
+            continue
+
+        lower_text = text.lower()
+        if table_expected_after is not None:
+            if kind == IDENTIFIER and lower_text in TABLE_MODIFIER_KEYWORDS:
+                result.append(text)
+                continue
+            keyword_index = table_expected_after
+            table_expected_after = None
+            if kind in (IDENTIFIER, QUOTED_IDENTIFIER) \
+                    and _next_significant_token(tokens, index) not in ('.', '(') \
+                    and _fold_identifier(kind, text) not in cte_names \
+                    and _is_user_table(kind, text, tables):
+                if keyword_index >= 0 and all(not item.strip() for item in result[keyword_index + 1:]):
+                    # Keep previous format: lower case keyword and single space before qualified name
+                    result[keyword_index] = result[keyword_index].lower()
+                    del result[keyword_index + 1:]
+                    result.append(' ')
+                result.append(f'{schema}.{text}')
+                previous_identifiers = []
+                continue
+
+        if cte_name_expected and kind in (IDENTIFIER, QUOTED_IDENTIFIER) \
+                and not (kind == IDENTIFIER and lower_text == 'recursive'):
+            cte_names.add(_fold_identifier(kind, text))
+            cte_name_expected = False
+            previous_identifiers = []
+            result.append(text)
+            continue
+
+        if kind == IDENTIFIER:
+            if lower_text in TABLE_KEYWORDS and (not function_depths or function_depths[-1] != depth) \
+                    and not _is_distinct_from_operator(lower_text, previous_identifiers):
+                table_expected_after = len(result)
+                if not from_clause_depths or from_clause_depths[-1] != depth:
+                    from_clause_depths.append(depth)
+            elif lower_text in FROM_CLAUSE_END_KEYWORDS and from_clause_depths and from_clause_depths[-1] == depth:
+                from_clause_depths.pop()
+            if lower_text == 'with' and _previous_significant_token(tokens, index) in (None, '('):
+                with_clause_depths.append(depth)
+                cte_name_expected = True
+            elif lower_text in WITH_CLAUSE_END_KEYWORDS and with_clause_depths and with_clause_depths[-1] == depth:
+                with_clause_depths.pop()
+            previous_identifiers.append(lower_text)
+        elif kind == PUNCTUATION:
+            if text == '(':
+                depth += 1
+                if previous_identifiers and previous_identifiers[-1] in FUNCTIONS_WITH_FROM:
+                    function_depths.append(depth)
+            elif text == ')':
+                if function_depths and function_depths[-1] == depth:
+                    function_depths.pop()
+                depth -= 1
+                while from_clause_depths and from_clause_depths[-1] > depth:
+                    from_clause_depths.pop()
+                while with_clause_depths and with_clause_depths[-1] > depth:
+                    with_clause_depths.pop()
+            elif text == ',' and from_clause_depths and from_clause_depths[-1] == depth:
+                table_expected_after = -1
+            elif text == ',' and with_clause_depths and with_clause_depths[-1] == depth:
+                cte_name_expected = True
+            previous_identifiers = []
         else:
-            view_sql = re.sub(f"(?i)join( |\n)+{table_name}", f'join {username}.{table_name}', view_sql)
-            view_sql = re.sub(f"(?i)from( |\n)+{table_name}", f'from {username}.{table_name}', view_sql)
-    return view_sql
\ No newline at end of file
+            previous_identifiers = []
+        result.append(text)
+
+    return ''.join(result)
+
+
+def _next_significant_token(tokens, index: int) -> str or None:
+    for next_index in range(index + 1, len(tokens)):
+        kind, text = tokens[next_index]
+        if kind not in (WHITESPACE, COMMENT):
+            return text
+    return None
+
+
+def _previous_significant_token(tokens, index: int) -> str or None:
+    for previous_index in range(index - 1, -1, -1):
+        kind, text = tokens[previous_index]
+        if kind not in (WHITESPACE, COMMENT):
+            return text
+    return None
+
+
+def _is_distinct_from_operator(lower_text: str, previous_identifiers: List[str]) -> bool:
+    """FROM of a IS [NOT] DISTINCT FROM b comparison"""
+    return lower_text == 'from' and previous_identifiers[-2:] in (['is', 'distinct'], ['not', 'distinct'])
+
+
+def _fold_identifier(kind: str, text: str) -> str:
+    # Postgres folds unquoted names to lower case
+    return unquote_identifier(text) if kind == QUOTED_IDENTIFIER else text.lower()
+
+
+def _is_user_table(kind: str, text: str, tables: Set[str] or None) -> bool:
+    return tables is None or _fold_identifier(kind, text) in tables
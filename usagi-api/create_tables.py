@@ -1,13 +1,17 @@
-from fill_usagi_data_tables import fill_usagi_data_tables
 from model.usagi_data.atc_to_rxnorm import atc_to_rxnorm
 from model.usagi_data.child import Child_Count
-from model.usagi_data.concept import Concept as UConcept, Concept_Id_To_Atc_Code, Concept_For_Index, Valid_Concept_Ids
+from model.usagi_data.data_version import Usagi_Data_Version, Solr_Index_Version
+from model.usagi_data.fill_step import Fill_Step
+from model.usagi_data.concept import Concept as UConcept, Concept_Id_To_Atc_Code, Concept_For_Index, \
+    Concept_Synonym_Hash, Valid_Concept_Ids
 from model.usagi_data.relations import Maps_To_Relationship, Parent_Child_Relationship, Relationship_Atc_Rxnorm
 from model.usagi_data.parent import Parent_Count
 from model.usagi.code_mapping_conversion import CodeMappingConversion
 from model.usagi.code_mapping_conversion_log import CodeMappingConversionLog
 from model.usagi.code_mapping_conversion_result import CodeMappingConversionResult
+from model.usagi.code_mapping_conversion_result_row import CodeMappingConversionResultRow
 from model.usagi.code_mapping_snapshot import CodeMappingSnapshot
+from refresh_usagi_data_tables import update_usagi_data_tables
 from util.usagi_db import usagi_pg_db
 
 
@@ -23,12 +27,19 @@ def create_usagi_data_tables():
         Child_Count,
         UConcept,
         Concept_For_Index,
+        Concept_Synonym_Hash,
+        Fill_Step,
+        Usagi_Data_Version,
     ])
 
 
 def create_and_fill_usagi_data_tables():
     create_usagi_data_tables()
-    fill_usagi_data_tables()
+    update_usagi_data_tables()
+
+
+def create_solr_index_tables():
+    usagi_pg_db.create_tables([Usagi_Data_Version, Solr_Index_Version])
 
 
 def create_usagi_tables():
@@ -36,5 +47,6 @@ def create_usagi_tables():
         CodeMappingConversion,
         CodeMappingConversionLog,
         CodeMappingConversionResult,
+        CodeMappingConversionResultRow,
         CodeMappingSnapshot,
     ])
\ No newline at end of file
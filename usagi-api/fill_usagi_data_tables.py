@@ -1,290 +1,352 @@
+from datetime import datetime
+from typing import Callable, Iterator, List, Tuple
+
 import pandas as pd
-from peewee import fn
-from sqlalchemy import create_engine
+from peewee import fn, Value
+from sqlalchemy import create_engine, text
 from app import app
 from model.usagi_data.atc_to_rxnorm import atc_to_rxnorm
 from model.usagi_data.child import Child_Count
-from model.usagi_data.concept import Concept as UConcept, Concept_Id_To_Atc_Code, Concept_For_Index, Valid_Concept_Ids
+from model.usagi_data.fill_step import Fill_Step
+from model.usagi_data.concept import Concept as UConcept, Concept_Id_To_Atc_Code, Concept_For_Index, \
+    Concept_Synonym_Hash, Valid_Concept_Ids
 from model.usagi_data.relations import Maps_To_Relationship, Parent_Child_Relationship, Relationship_Atc_Rxnorm
 from model.usagi_data.parent import Parent_Count
-from model.vocabulary.concept_vocabulary_model import Concept, Concept_Relationship, Concept_Ancestor
-from util.constants import INSERT_BATCH_SIZE
-from util.usagi_db import usagi_pg_db
+from model.vocabulary.concept_vocabulary_model import Concept, Concept_Relationship, Concept_Ancestor, Concept_Synonym
+from util.bulk_loader import BulkLoader
+from util.constants import USAGI_DATA_CHUNK_SIZE, USAGI_DATA_USE_STAGING_TABLES, USAGI_DATA_FILL_WORKERS
+from util.dag_runner import Step, run_steps
+from util.vocabulary_db import vocabulary_pg_db
 
 vocabulary_engine = create_engine(
     f'postgresql://{app.config["VOCABULARY_DB_USER"]}:{app.config["VOCABULARY_DB_PASSWORD"]}@{app.config["VOCABULARY_DB_HOST"]}:{app.config["VOCABULARY_DB_PORT"]}/{app.config["VOCABULARY_DB_NAME"]}'
 )
 
-usagi_engine = create_engine(
-    f'postgresql://{app.config["USAGI_DB_USER"]}:{app.config["USAGI_DB_PASSWORD"]}@{app.config["USAGI_DB_HOST"]}:{app.config["USAGI_DB_PORT"]}/{app.config["USAGI_DB_NAME"]}'
-)
+CONCEPT_FOR_INDEX_FIELDS = [
+    Concept_For_Index.type,
+    Concept_For_Index.term_type,
+    Concept_For_Index.term,
+    Concept_For_Index.concept_id,
+    Concept_For_Index.domain_id,
+    Concept_For_Index.vocabulary_id,
+    Concept_For_Index.concept_class_id,
+    Concept_For_Index.standard_concept,
+]
+CONCEPT_FOR_INDEX_COLUMNS = [field.column_name for field in CONCEPT_FOR_INDEX_FIELDS]
+
+
+def fill_usagi_data_tables(vocabulary_version: str = None):
+    """
+    Build usagi data tables in full. Fill steps run in parallel by dependencies, each step uses its own connection.
+    Completed steps are stored, a failed fill of the same vocabulary version continues from the failed steps
+    """
+    completed_steps = [step.name for step in Fill_Step.select(Fill_Step.name)
+                       .where(Fill_Step.vocabulary_version == vocabulary_version)]
+
+    def save_completed_step(name: str, seconds: float):
+        Fill_Step.insert(name=name, vocabulary_version=vocabulary_version, duration=seconds).on_conflict(
+            conflict_target=[Fill_Step.name],
+            update={Fill_Step.vocabulary_version: vocabulary_version,
+                    Fill_Step.completed_at: datetime.now(),
+                    Fill_Step.duration: seconds}
+        ).execute()
+
+    run_steps([Step(step.name, _with_connection(step.run), step.dependencies) for step in FILL_STEPS],
+              app.config.get('USAGI_DATA_FILL_WORKERS', USAGI_DATA_FILL_WORKERS),
+              completed=completed_steps,
+              on_step_completed=save_completed_step,
+              logger=app.logger)
+
+
+def _with_connection(run: Callable[[], None]) -> Callable[[], None]:
+    def run_with_connection():
+        vocabulary_pg_db.connect(reuse_if_open=True)
+        try:
+            run()
+        finally:
+            vocabulary_pg_db.close()
+    return run_with_connection
+
+
+def truncate_table(model):
+    vocabulary_pg_db.execute_sql(f'TRUNCATE TABLE "{model._meta.schema}"."{model._meta.table_name}"')
+
+
+def create_bulk_loader(model, columns: List[str], replace: bool = True) -> BulkLoader:
+    """
+    Loader of usagi data table, with replace=True a staging table replaces the table if it is enabled in config,
+    otherwise the table is truncated, so a restarted step does not duplicate rows
+    """
+    use_staging = replace and app.config.get('USAGI_DATA_USE_STAGING_TABLES', USAGI_DATA_USE_STAGING_TABLES)
+    if replace and not use_staging:
+        truncate_table(model)
+    return BulkLoader(vocabulary_pg_db, model._meta.schema, model._meta.table_name, columns,
+                      replace=use_staging, logger=app.logger)
+
+
+def insert_from_select(model, fields, query, replace: bool = True):
+    """Run INSERT ... SELECT inside the vocabulary database, rows are not transferred to the client"""
+    with create_bulk_loader(model, [field.column_name for field in fields], replace) as loader:
+        loader.insert_from_select(query)
+
+
+def select_valid_concept_pairs(model, concept_id_1_field, concept_id_2_field, *conditions):
+    """Select concept id pairs of model where both concepts are valid, filtered by joins with valid_concept_ids"""
+    valid_concept_1 = Valid_Concept_Ids.alias('valid_concept_1')
+    valid_concept_2 = Valid_Concept_Ids.alias('valid_concept_2')
+    return model.select(
+        concept_id_1_field, concept_id_2_field
+    ).join(
+        valid_concept_1, on=(concept_id_1_field == valid_concept_1.concept_id)
+    ).switch(model).join(
+        valid_concept_2, on=(concept_id_2_field == valid_concept_2.concept_id)
+    ).where(
+        (concept_id_1_field != concept_id_2_field), *conditions
+    )
+
+
+def select_valid_concept_ids():
+    return Concept.select(Concept.concept_id).where(Concept.invalid_reason.is_null(True))
+
+
+def select_concept_id_to_atc_code():
+    return Concept.select(Concept.concept_id, Concept.concept_code).where(
+        (Concept.invalid_reason.is_null(True)) & (Concept.vocabulary_id == 'ATC')
+    )
+
+
+def select_maps_to_relationship():
+    return select_valid_concept_pairs(Concept_Relationship,
+                                      Concept_Relationship.concept_id_1,
+                                      Concept_Relationship.concept_id_2,
+                                      Concept_Relationship.relationship_id == 'Maps to',
+                                      Concept_Relationship.invalid_reason.is_null(True))
+
+
+def select_relationship_atc_rxnorm():
+    return select_valid_concept_pairs(Concept_Relationship,
+                                      Concept_Relationship.concept_id_1,
+                                      Concept_Relationship.concept_id_2,
+                                      Concept_Relationship.relationship_id == 'ATC - RxNorm',
+                                      Concept_Relationship.invalid_reason.is_null(True))
+
+
+def select_atc_to_rxnorm():
+    return Concept_Id_To_Atc_Code.select(
+        Concept_Id_To_Atc_Code.concept_code, Relationship_Atc_Rxnorm.concept_id_2
+    ).join(Relationship_Atc_Rxnorm, on=(
+            Concept_Id_To_Atc_Code.concept_id == Relationship_Atc_Rxnorm.concept_id_1
+        )
+    )
+
+
+def select_parent_child_relationship():
+    return select_valid_concept_pairs(Concept_Ancestor,
+                                      Concept_Ancestor.ancestor_concept_id,
+                                      Concept_Ancestor.descendant_concept_id,
+                                      Concept_Ancestor.min_levels_of_separation == 1)
+
+
+def select_parent_count():
+    return Parent_Child_Relationship.select(
+        Parent_Child_Relationship.descendant_concept_id,
+        fn.COUNT(Parent_Child_Relationship.ancestor_concept_id)
+    ).group_by(Parent_Child_Relationship.descendant_concept_id)
+
+
+def select_child_count():
+    return Parent_Child_Relationship.select(
+        Parent_Child_Relationship.ancestor_concept_id,
+        fn.COUNT(Parent_Child_Relationship.descendant_concept_id)
+    ).group_by(Parent_Child_Relationship.ancestor_concept_id)
+
+
+def select_concept_synonym_hash():
+    return Concept_Synonym.select(
+        Concept_Synonym.concept_id,
+        fn.MD5(fn.STRING_AGG(Concept_Synonym.concept_synonym_name, '\n').order_by(Concept_Synonym.concept_synonym_name))
+    ).group_by(Concept_Synonym.concept_id)
 
-valid_concept_records = []
+
+# Derived tables in dependency order: {model: (fields, select query of table rows)}
+DERIVED_TABLES = {
+    Valid_Concept_Ids: ([Valid_Concept_Ids.concept_id], select_valid_concept_ids),
+    Concept_Id_To_Atc_Code: ([Concept_Id_To_Atc_Code.concept_id, Concept_Id_To_Atc_Code.concept_code],
+                             select_concept_id_to_atc_code),
+    Maps_To_Relationship: ([Maps_To_Relationship.concept_id_1, Maps_To_Relationship.concept_id_2],
+                           select_maps_to_relationship),
+    Relationship_Atc_Rxnorm: ([Relationship_Atc_Rxnorm.concept_id_1, Relationship_Atc_Rxnorm.concept_id_2],
+                              select_relationship_atc_rxnorm),
+    atc_to_rxnorm: ([atc_to_rxnorm.concept_code, atc_to_rxnorm.concept_id_2], select_atc_to_rxnorm),
+    Parent_Child_Relationship: ([Parent_Child_Relationship.ancestor_concept_id,
+                                 Parent_Child_Relationship.descendant_concept_id],
+                                select_parent_child_relationship),
+    Parent_Count: ([Parent_Count.descendant_concept_id, Parent_Count.parent_count], select_parent_count),
+    Child_Count: ([Child_Count.ancestor_concept_id, Child_Count.child_count], select_child_count),
+    Concept_Synonym_Hash: ([Concept_Synonym_Hash.concept_id, Concept_Synonym_Hash.synonyms_hash],
+                           select_concept_synonym_hash),
+}
+
+
+def create_derived_table(model) -> Callable[[], None]:
+    def create():
+        fields, select = DERIVED_TABLES[model]
+        insert_from_select(model, fields, select())
+    return create
 
 
-def fill_usagi_data_tables():
-    create_valid_concept_ids()
-    create_concept_id_to_atc_code()
-    create_maps_to_relationship()
-    create_relationship_atc_rxnorm()
-    create_atc_to_rxnorm()
-    create_parent_child_relationship()
-    create_parent_count()
-    create_child_count()
-    create_usagi_concept()
+def create_usagi_concept():
+    columns = [field.column_name for field in UConcept._meta.sorted_fields]
+    with create_bulk_loader(UConcept, columns) as loader:
+        for start, end in iterate_concept_id_ranges('vocabulary.concept'):
+            records = read_sql_range(
+                'SELECT concept_id, concept_name, domain_id, vocabulary_id, concept_class_id, standard_concept, '
+                'concept_code, valid_start_date, valid_end_date, invalid_reason '
+                'FROM vocabulary.concept WHERE concept_id BETWEEN :start AND :end', start, end)
+            parent_count_records = read_sql_range(
+                'SELECT descendant_concept_id AS concept_id, parent_count FROM usagi_data.parent_count '
+                'WHERE descendant_concept_id BETWEEN :start AND :end', start, end)
+            child_count_records = read_sql_range(
+                'SELECT ancestor_concept_id AS concept_id, child_count FROM usagi_data.child_count '
+                'WHERE ancestor_concept_id BETWEEN :start AND :end', start, end)
+            records = records \
+                .merge(parent_count_records, how='left', on='concept_id') \
+                .merge(child_count_records, how='left', on='concept_id')
+            records = records.astype({'parent_count': 'Int64', 'child_count': 'Int64'})
+            loader.copy_data_frame(records)
+
+
+def create_concept_for_index_table():
+    """Rows are appended by four builders, the table is truncated first, so a restarted step does not duplicate rows"""
+    truncate_table(Concept_For_Index)
     create_concept_for_index()
     create_concept_for_index_2()
     create_concept_for_index_3()
     create_concept_for_index_4()
 
-    valid_concept_records.clear()
-
-
-def create_valid_concept_ids():
-    records = Concept.select(Concept.concept_id).where(Concept.invalid_reason.is_null(True)).dicts()
-    global valid_concept_records
-    valid_concept_records = [record["concept_id"] for record in records]
-    if Valid_Concept_Ids.select().count() == 0:
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Valid_Concept_Ids.insert_many(rows).execute()
-
-
-def create_concept_id_to_atc_code():
-    if Concept_Id_To_Atc_Code.select().count() == 0:
-        records = Concept.select(Concept.concept_id, Concept.concept_code).where((Concept.invalid_reason.is_null(True)) & (Concept.vocabulary_id=='ATC')).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Concept_Id_To_Atc_Code.insert_many(rows).execute()
-
-
-def create_maps_to_relationship():
-    if Maps_To_Relationship.select().count() == 0:
-        records = Concept_Relationship.select(
-            Concept_Relationship.concept_id_1, Concept_Relationship.concept_id_2
-        ).where((
-                Concept_Relationship.relationship_id=='Maps to'
-            ) & (
-                Concept_Relationship.invalid_reason.is_null(True)
-            ) & (
-                Concept_Relationship.concept_id_1!=Concept_Relationship.concept_id_2
-             ) & (
-                Concept_Relationship.concept_id_1.in_(valid_concept_records)
-            ) & (
-                Concept_Relationship.concept_id_2.in_(valid_concept_records)
-            )
-        ).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Maps_To_Relationship.insert_many(rows).execute()
-
-
-def create_relationship_atc_rxnorm():
-    if Relationship_Atc_Rxnorm.select().count() == 0:
-        records = Concept_Relationship.select(
-            Concept_Relationship.concept_id_1, Concept_Relationship.concept_id_2
-        ).where((
-                Concept_Relationship.relationship_id=='ATC - RxNorm'
-            ) & (
-                Concept_Relationship.invalid_reason.is_null(True)
-            ) & (
-                Concept_Relationship.concept_id_1!=Concept_Relationship.concept_id_2
-            ) & (
-                Concept_Relationship.concept_id_1.in_(valid_concept_records)
-            ) & (
-                Concept_Relationship.concept_id_2.in_(valid_concept_records)
-            )
-        ).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Relationship_Atc_Rxnorm.insert_many(rows).execute()
-
-
-def create_atc_to_rxnorm():
-    if atc_to_rxnorm.select().count() == 0:
-        records = Concept_Id_To_Atc_Code.select(
-            Concept_Id_To_Atc_Code.concept_code, Relationship_Atc_Rxnorm.concept_id_2
-        ).join(Relationship_Atc_Rxnorm, on=(
-                Concept_Id_To_Atc_Code.concept_id==Relationship_Atc_Rxnorm.concept_id_1
-            )
-        ).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                atc_to_rxnorm.insert_many(rows).execute()
-
-
-def create_parent_child_relationship():
-    if Parent_Child_Relationship.select().count() == 0:
-        records = Concept_Ancestor.select(
-            Concept_Ancestor.ancestor_concept_id, Concept_Ancestor.descendant_concept_id
-        ).where(
-            (
-                Concept_Ancestor.min_levels_of_separation==1
-            ) & (
-                Concept_Ancestor.ancestor_concept_id!=Concept_Ancestor.descendant_concept_id
-            ) & (
-                Concept_Ancestor.ancestor_concept_id.in_(valid_concept_records)
-            ) & (
-                Concept_Ancestor.descendant_concept_id.in_(valid_concept_records)
-            )
-        ).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Parent_Child_Relationship.insert_many(rows).execute()
-
-
-def create_parent_count():
-    if Parent_Count.select().count() == 0:
-        records = Parent_Child_Relationship.select(
-            Parent_Child_Relationship.descendant_concept_id,
-            fn.COUNT(Parent_Child_Relationship.ancestor_concept_id).alias('parent_count')
-        ).group_by(Parent_Child_Relationship.descendant_concept_id).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Parent_Count.insert_many(rows).execute()
-
-
-def create_child_count():
-    if Child_Count.select().count() == 0:
-        records = Parent_Child_Relationship.select(
-            Parent_Child_Relationship.ancestor_concept_id,
-            fn.COUNT(Parent_Child_Relationship.descendant_concept_id).alias('child_count')
-        ).group_by(Parent_Child_Relationship.ancestor_concept_id).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Child_Count.insert_many(rows).execute()
 
-
-def create_usagi_concept():
-    if UConcept.select().count() == 0:
-        parent_count_records = pd.read_sql_table('parent_count', usagi_engine, 'usagi')
-        child_count_records = pd.read_sql_table('child_count', usagi_engine, 'usagi')
-        vconcept_records = pd.read_sql_table('concept', vocabulary_engine, 'vocabulary')
-        records = vconcept_records.merge(parent_count_records, how='outer', left_on='concept_id', right_on='descendant_concept_id')
-        parent_count_records = None
-        vconcept_records = None
-        records = records.merge(child_count_records, how='outer', left_on='concept_id', right_on='ancestor_concept_id')
-        child_count_records = None
-        records.drop(['id_x', 'id_y', 'descendant_concept_id', 'ancestor_concept_id'], axis=1, inplace=True)
-        records.to_sql('concept', usagi_engine, 'usagi', chunksize=1000, index=False, if_exists='append')
+def select_concept_for_index(concept_ids=None):
+    """Names of standard and classification concepts. Queries of concept for index take optional concept ids subquery"""
+    query = UConcept.select(
+        Value('C'), Value('C'), UConcept.concept_name, UConcept.concept_id, UConcept.domain_id,
+        UConcept.vocabulary_id, UConcept.concept_class_id, UConcept.standard_concept
+    ).where(UConcept.standard_concept.in_(('S', 'C')))
+    return query if concept_ids is None else query.where(UConcept.concept_id.in_(concept_ids))
+
+
+def select_concept_for_index_2(concept_ids=None):
+    """Names of non-standard concepts for the standard concepts they map to"""
+    t1 = UConcept.alias()
+    t2 = Maps_To_Relationship.alias()
+    t3 = UConcept.alias()
+    query = t1.select(
+        Value('S'), Value('C'), t1.concept_name, t3.concept_id, t3.domain_id,
+        t3.vocabulary_id, t3.concept_class_id, t3.standard_concept
+    ).join(
+        t2, on=(t1.concept_id==t2.concept_id_1)
+    ).join(
+        t3, on=(t2.concept_id_2==t3.concept_id)
+    ).where(
+        (
+            t1.standard_concept.is_null(True)
+        ) & (
+            fn.LOWER(t1.concept_name)!=fn.LOWER(t3.concept_name)
+        )
+    ).distinct()
+    return query if concept_ids is None else query.where(t3.concept_id.in_(concept_ids))
+
+
+def select_concept_for_index_3(concept_ids=None):
+    """Synonyms of standard and classification concepts"""
+    query = UConcept.select(
+        Value('C'), Value('C'), Concept_Synonym.concept_synonym_name, UConcept.concept_id, UConcept.domain_id,
+        UConcept.vocabulary_id, UConcept.concept_class_id, UConcept.standard_concept
+    ).join(
+        Concept_Synonym, on=(UConcept.concept_id == Concept_Synonym.concept_id)
+    ).where(
+        (UConcept.standard_concept.in_(('S', 'C'))) &
+        (fn.LOWER(UConcept.concept_name) != fn.LOWER(Concept_Synonym.concept_synonym_name))
+    )
+    return query if concept_ids is None else query.where(UConcept.concept_id.in_(concept_ids))
+
+
+def select_concept_for_index_4(concept_ids=None):
+    """Synonyms of non-standard concepts for the standard concepts they map to"""
+    t1 = UConcept.alias()
+    t3 = UConcept.alias()
+    query = t1.select(
+        Value('C'), Value('S'), Concept_Synonym.concept_synonym_name, t3.concept_id, t3.domain_id,
+        t3.vocabulary_id, t3.concept_class_id, t3.standard_concept
+    ).join(
+        Concept_Synonym, on=(t1.concept_id == Concept_Synonym.concept_id)
+    ).switch(t1).join(
+        Maps_To_Relationship, on=(t1.concept_id == Maps_To_Relationship.concept_id_1)
+    ).join(
+        t3, on=(Maps_To_Relationship.concept_id_2 == t3.concept_id)
+    ).where(
+        (t1.standard_concept.is_null(True)) &
+        (fn.LOWER(t3.concept_name) != fn.LOWER(Concept_Synonym.concept_synonym_name))
+    )
+    return query if concept_ids is None else query.where(t3.concept_id.in_(concept_ids))
 
 
 def create_concept_for_index():
-    if Concept_For_Index.select().where((Concept_For_Index.type=='C') & (Concept_For_Index.term_type=='C')).count() == 0:
-        records = UConcept.select(
-            UConcept.concept_name.alias('term'), UConcept.concept_id, UConcept.domain_id,
-            UConcept.vocabulary_id, UConcept.concept_class_id, UConcept.standard_concept
-        ).where(UConcept.standard_concept.in_(('S', 'C'))).dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Concept_For_Index.insert_many([{"type": 'C', "term_type": 'C', **row} for row in rows]).execute()
+    insert_from_select(Concept_For_Index, CONCEPT_FOR_INDEX_FIELDS, select_concept_for_index(), replace=False)
 
 
 def create_concept_for_index_2():
-    if Concept_For_Index.select().where((Concept_For_Index.type=='S') & (Concept_For_Index.term_type=='C')).count() == 0:
-        t1 = UConcept.alias()
-        t2 = Maps_To_Relationship.alias()
-        t3 = UConcept.alias()
-        records = t1.select(
-            t1.concept_name.alias('term'), t3.concept_id, t3.domain_id,
-            t3.vocabulary_id, t3.concept_class_id, t3.standard_concept
-        ).join(
-            t2, on=(t1.concept_id==t2.concept_id_1)
-        ).join(
-            t3, on=(t2.concept_id_2==t3.concept_id)
-        ).where(
-            (
-                t1.standard_concept.is_null(True)
-            ) & (
-                fn.LOWER(t1.concept_name)!=fn.LOWER(t3.concept_name)
-            )
-        ).distinct().dicts()
-        with usagi_pg_db.atomic():
-            for idx in range(0, len(records), INSERT_BATCH_SIZE):
-                rows = records[idx:idx + INSERT_BATCH_SIZE]
-                Concept_For_Index.insert_many([{"type": 'S', "term_type": 'C', **row} for row in rows]).execute()
+    insert_from_select(Concept_For_Index, CONCEPT_FOR_INDEX_FIELDS, select_concept_for_index_2(), replace=False)
 
 
 def create_concept_for_index_3():
-    if Concept_For_Index.select().join(
-        UConcept, on=(Concept_For_Index.concept_id==UConcept.concept_id)
-    ).where((
-        Concept_For_Index.type=='C') & (
-        Concept_For_Index.term_type=='C') & (
-        Concept_For_Index.standard_concept.in_(('S', 'C'))) & (
-        fn.LOWER(Concept_For_Index.term)!=fn.LOWER(UConcept.concept_name))
-    ).count() == 0:
-        concept_synonym_records = pd.read_sql_table('concept_synonym', vocabulary_engine, 'vocabulary')
-        uconcept_records = pd.read_sql_table('concept', usagi_engine, 'usagi')
-        records = uconcept_records.merge(concept_synonym_records, how='inner', on='concept_id')
-        concept_synonym_records = None
-        uconcept_records = None
-        records = records.loc[(records['concept_name'].str.lower() != records['concept_synonym_name'].str.lower()) &
-              records['standard_concept'].isin(['S', 'C'])]
-        records.drop([
-            'parent_count',
-            'child_count',
-            'concept_code',
-            'invalid_reason',
-            'valid_end_date',
-            'valid_start_date',
-            'concept_name',
-            'language_concept_id'
-            ], axis=1, inplace=True)
-        records.rename(columns={'concept_synonym_name': 'term'}, inplace=True)
-        records["type"] = "C"
-        records["term_type"] = "C"
-        records.to_sql('concept_for_index', usagi_engine, 'usagi', chunksize=1000, index=False, if_exists='append')
+    insert_synonyms_for_index(select_concept_for_index_3())
 
 
 def create_concept_for_index_4():
-    if Concept_For_Index.select().join(
-        UConcept, on=(Concept_For_Index.concept_id==UConcept.concept_id)
-    ).where((
-        Concept_For_Index.type=='C') & (
-        Concept_For_Index.term_type=='S') & (
-        UConcept.standard_concept.is_null(True)) & (
-        fn.LOWER(Concept_For_Index.term)!=fn.LOWER(UConcept.concept_name))
-    ).count() == 0:
-        concept_synonym_records = pd.read_sql_table('concept_synonym', vocabulary_engine, 'vocabulary')
-        uconcept_records_1 = pd.read_sql_table('concept', usagi_engine, 'usagi', columns=['standard_concept', 'concept_id'])
-        uconcept_records_1.rename(columns={'standard_concept': 'standard_concept_1'}, inplace=True)
-        records = uconcept_records_1.merge(concept_synonym_records, how='inner', on='concept_id')
-        concept_synonym_records = None
-        uconcept_records_1 = None
-        maps_to_rels_records = pd.read_sql_table('maps_to_relationship', usagi_engine, 'usagi')
-        records = records.merge(maps_to_rels_records, how='inner', left_on='concept_id', right_on='concept_id_1')
-        maps_to_rels_records = None
-        uconcept_records_2 = pd.read_sql_table('concept', usagi_engine, 'usagi', columns=[
-                                                                                         'concept_id',
-                                                                                         'concept_name',
-                                                                                         'domain_id',
-                                                                                         'vocabulary_id',
-                                                                                         'concept_class_id',
-                                                                                         'standard_concept'
-                                                                                         ])
-        records = records.merge(uconcept_records_2, how='inner', left_on='concept_id_2', right_on='concept_id')
-        records = records.loc[(records['concept_name'].str.lower() != records['concept_synonym_name'].str.lower()) &
-              records['standard_concept_1'].isna()]
-        records.drop([
-            'id',
-            'standard_concept_1',
-            'language_concept_id',
-            'concept_id_1',
-            'concept_id_2',
-            'concept_id_x',
-            'concept_name'
-            ], axis=1, inplace=True)
-        records.rename(columns={'concept_synonym_name': 'term', 'concept_id_y': 'concept_id'}, inplace=True)
-        records["type"] = "C"
-        records["term_type"] = "S"
-        records.to_sql('concept_for_index', usagi_engine, 'usagi', chunksize=1000, index=False, if_exists='append')
+    insert_synonyms_for_index(select_concept_for_index_4())
+
+
+def insert_synonyms_for_index(query):
+    """
+    Insert rows of concept for index synonyms query by ranges of synonym concept ids,
+    so each INSERT ... SELECT joins a bounded part of concept_synonym
+    """
+    with create_bulk_loader(Concept_For_Index, CONCEPT_FOR_INDEX_COLUMNS, replace=False) as loader:
+        for start, end in iterate_concept_id_ranges('usagi_data.concept'):
+            loader.insert_from_select(query.where(Concept_Synonym.concept_id.between(start, end)))
+
+
+def iterate_concept_id_ranges(table: str, chunk_size: int = None) -> Iterator[Tuple[int, int]]:
+    """
+    Split concept ids of table to (first, last) ranges of chunk_size ids each.
+    Ids are read by a server-side cursor, so memory does not depend on table size
+    """
+    chunk_size = chunk_size or app.config.get('USAGI_DATA_CHUNK_SIZE', USAGI_DATA_CHUNK_SIZE)
+    with vocabulary_engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(
+            text(f'SELECT concept_id FROM {table} ORDER BY concept_id')
+        )
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows[0][0], rows[-1][0]
+
+
+def read_sql_range(sql: str, start: int, end: int) -> pd.DataFrame:
+    return pd.read_sql(text(sql), vocabulary_engine, params={'start': start, 'end': end})
+
+
+FILL_STEPS = [
+    Step('valid_concept_ids', create_derived_table(Valid_Concept_Ids)),
+    Step('concept_id_to_atc_code', create_derived_table(Concept_Id_To_Atc_Code)),
+    Step('maps_to_relationship', create_derived_table(Maps_To_Relationship), ('valid_concept_ids',)),
+    Step('relationship_atc_rxnorm', create_derived_table(Relationship_Atc_Rxnorm), ('valid_concept_ids',)),
+    Step('atc_to_rxnorm', create_derived_table(atc_to_rxnorm), ('concept_id_to_atc_code', 'relationship_atc_rxnorm')),
+    Step('parent_child_relationship', create_derived_table(Parent_Child_Relationship), ('valid_concept_ids',)),
+    Step('parent_count', create_derived_table(Parent_Count), ('parent_child_relationship',)),
+    Step('child_count', create_derived_table(Child_Count), ('parent_child_relationship',)),
+    Step('concept_synonym_hash', create_derived_table(Concept_Synonym_Hash)),
+    Step('usagi_concept', create_usagi_concept, ('parent_count', 'child_count')),
+    Step('concept_for_index', create_concept_for_index_table, ('usagi_concept', 'maps_to_relationship')),
+]
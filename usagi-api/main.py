@@ -4,7 +4,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from waitress import serve
 from app import app
 from config import PORT, IMPORT_DATA_TO_SOLR
-from create_tables import create_usagi_tables, create_and_fill_usagi_data_tables
+from create_tables import create_usagi_tables, create_and_fill_usagi_data_tables, create_solr_index_tables
 from service.solr_core_service import create_index_if_not_exist
 from usagi_api import usagi
 from util.usagi_db import usagi_pg_db
@@ -51,6 +51,7 @@ if __name__ == '__main__':
     if init_usagi_data.lower() in ['true', 'yes', 'y', '1', 't']:
         create_and_fill_usagi_data_tables()
     if IMPORT_DATA_TO_SOLR:
+        create_solr_index_tables()
         import_data_scheduler.add_job(func=import_data, trigger='interval', seconds=5, id=job_id)
         import_data_scheduler.start()
     serve(app, host='0.0.0.0', port=PORT)
\ No newline at end of file
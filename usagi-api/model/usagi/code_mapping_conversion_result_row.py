@@ -0,0 +1,22 @@
+from peewee import AutoField, TextField, ForeignKeyField, IntegerField, FloatField, CharField
+from model.usagi.code_mapping_conversion import CodeMappingConversion
+from model.usagi.usagi_base_model import UsagiBaseModel
+
+
+class CodeMappingConversionResultRow(UsagiBaseModel):
+    """Code mapping of one source code, position is the source code index in conversion input"""
+    id = AutoField()
+    conversion = ForeignKeyField(CodeMappingConversion, backref='result_rows', on_delete='CASCADE')
+    position = IntegerField()
+    source_code = TextField(null=True)
+    source_name = TextField(null=True)
+    source_frequency = IntegerField(null=True)
+    mapping_status = CharField(max_length=25)
+    match_score = FloatField()
+    result = TextField()
+
+    class Meta:
+        db_table = 'code_mapping_conversion_result_row'
+        indexes = (
+            (('conversion', 'position'), True),
+        )
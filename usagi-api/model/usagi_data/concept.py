@@ -35,4 +35,10 @@ class Concept_For_Index(UsagiDataBaseModel):
     vocabulary_id = CharField()
     concept_class_id = CharField()
     standard_concept = CharField(null=True)
-    term_type = CharField()
\ No newline at end of file
+    term_type = CharField()
+
+
+class Concept_Synonym_Hash(UsagiDataBaseModel):
+    """Hash of sorted synonyms of a concept, used to find concepts with changed synonyms in a new vocabulary"""
+    concept_id = IntegerField(primary_key=True)
+    synonyms_hash = CharField()
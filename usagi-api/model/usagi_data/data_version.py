@@ -0,0 +1,23 @@
+from datetime import datetime
+from peewee import AutoField, BooleanField, CharField, DateTimeField, IntegerField
+
+from model.usagi_data.usagi_data_base_model import UsagiDataBaseModel
+
+
+class Usagi_Data_Version(UsagiDataBaseModel):
+    """Vocabulary version of built usagi data tables, the last row is the current version"""
+    id = AutoField()
+    vocabulary_version = CharField()
+    incremental = BooleanField(default=False)
+    built_at = DateTimeField(default=datetime.now)
+
+
+class Solr_Index_Version(UsagiDataBaseModel):
+    """
+    Usagi data version indexed to a Solr core. The row is deleted before reindexing and created after the final commit,
+    so a core without a row or with another version is reindexed on start
+    """
+    core = CharField(primary_key=True)
+    vocabulary_version = CharField(null=True)
+    documents = IntegerField()
+    indexed_at = DateTimeField(default=datetime.now)
@@ -0,0 +1,12 @@
+from datetime import datetime
+from peewee import CharField, DateTimeField, FloatField
+
+from model.usagi_data.usagi_data_base_model import UsagiDataBaseModel
+
+
+class Fill_Step(UsagiDataBaseModel):
+    """Completed step of usagi data tables fill, steps completed for the same vocabulary version are skipped on restart"""
+    name = CharField(primary_key=True)
+    vocabulary_version = CharField(null=True)
+    completed_at = DateTimeField(default=datetime.now)
+    duration = FloatField()
@@ -0,0 +1,167 @@
+from typing import Optional, Tuple
+
+from peewee import fn, SQL
+from app import app
+from fill_usagi_data_tables import fill_usagi_data_tables, DERIVED_TABLES, CONCEPT_FOR_INDEX_FIELDS, \
+    select_concept_for_index, select_concept_for_index_2, select_concept_for_index_3, select_concept_for_index_4
+from model.usagi_data.concept import Concept as UConcept, Concept_For_Index, Concept_Synonym_Hash
+from model.usagi_data.data_version import Usagi_Data_Version
+from model.usagi_data.fill_step import Fill_Step
+from model.usagi_data.relations import Maps_To_Relationship
+from model.usagi_data.parent import Parent_Count
+from model.usagi_data.child import Child_Count
+from model.vocabulary.concept_vocabulary_model import Vocabulary
+from util.vocabulary_db import vocabulary_pg_db
+
+USAGI_CONCEPT_COLUMNS = ['concept_id', 'concept_name', 'domain_id', 'vocabulary_id', 'concept_class_id',
+                         'standard_concept', 'concept_code', 'valid_start_date', 'valid_end_date', 'invalid_reason']
+
+
+def update_usagi_data_tables() -> bool:
+    """
+    Bring usagi data tables to the loaded vocabulary version: build them in full when no version is recorded,
+    refresh changed rows when the vocabulary version changed, do nothing when it is the same.
+    Return True if tables were changed
+    """
+    vocabulary_version = get_vocabulary_version()
+    built_version = get_built_vocabulary_version()
+    if built_version == vocabulary_version:
+        app.logger.info('Usagi data tables are up to date with the vocabulary version')
+        return False
+    if built_version is None:
+        app.logger.info('Building usagi data tables')
+        fill_usagi_data_tables(vocabulary_version)
+    else:
+        app.logger.info('Vocabulary version changed, refreshing usagi data tables')
+        refresh_usagi_data_tables()
+    with vocabulary_pg_db.atomic():
+        Usagi_Data_Version.create(vocabulary_version=vocabulary_version, incremental=built_version is not None)
+        Fill_Step.delete().execute()
+    return True
+
+
+def get_vocabulary_version() -> str:
+    """Hash of versions of all loaded vocabularies, changes when any vocabulary is reloaded with a new version"""
+    return Vocabulary.select(
+        fn.MD5(fn.STRING_AGG(
+            Vocabulary.vocabulary_id.concat(':').concat(fn.COALESCE(Vocabulary.vocabulary_version, '')), ';'
+        ).order_by(Vocabulary.vocabulary_id))
+    ).scalar()
+
+
+def get_built_vocabulary_version() -> Optional[str]:
+    version = Usagi_Data_Version.select().order_by(Usagi_Data_Version.id.desc()).first()
+    return version.vocabulary_version if version is not None else None
+
+
+def refresh_usagi_data_tables():
+    """
+    Recompute rows of changed concepts, relationships and synonyms in one transaction.
+    Concepts are compared with the vocabulary by concept_id, names, classification and valid dates,
+    derived relationship and count tables get only their removed and added rows,
+    synonyms are compared by hashes stored for each concept
+    """
+    with vocabulary_pg_db.atomic():
+        create_changed_concept_ids()
+        for model, (fields, select) in DERIVED_TABLES.items():
+            removed, added = sync_table(model, fields, select())
+            app.logger.info(f'{model._meta.table_name}: removed {removed}, added {added} rows')
+        refresh_usagi_concepts()
+        refresh_concept_for_index()
+
+
+def execute(sql: str, params=None):
+    return vocabulary_pg_db.execute_sql(sql, params)
+
+
+def create_changed_concept_ids():
+    """Temp table of concept ids which are added, deleted or changed in the vocabulary since the last build"""
+    vocabulary_values = ', '.join(f'v.{column}' for column in USAGI_CONCEPT_COLUMNS[1:])
+    usagi_values = ', '.join(f'u.{column}' for column in USAGI_CONCEPT_COLUMNS[1:])
+    execute(
+        'CREATE TEMP TABLE changed_concept_ids ON COMMIT DROP AS '
+        'SELECT COALESCE(v.concept_id, u.concept_id) AS concept_id '
+        'FROM vocabulary.concept v '
+        'FULL JOIN usagi_data.concept u ON u.concept_id = v.concept_id '
+        'WHERE v.concept_id IS NULL OR u.concept_id IS NULL '
+        f'OR ({vocabulary_values}) IS DISTINCT FROM ({usagi_values})'
+    )
+
+
+def sync_table(model, fields, query) -> Tuple[int, int]:
+    """
+    Make rows of table equal to rows of query by deleting removed rows and inserting added ones.
+    Removed and added rows are kept in {table}_removed and {table}_added temp tables until commit.
+    Return counts of removed and added rows
+    """
+    table = model._meta.table_name
+    target = f'"{model._meta.schema}"."{table}"'
+    columns = ', '.join(f'"{field.column_name}"' for field in fields)
+    select_sql, params = query.sql()
+    execute(f'CREATE TEMP TABLE "{table}_new" ({columns}) ON COMMIT DROP AS {select_sql}', params)
+    execute(f'CREATE TEMP TABLE "{table}_removed" ON COMMIT DROP AS '
+            f'SELECT {columns} FROM {target} EXCEPT SELECT {columns} FROM "{table}_new"')
+    execute(f'CREATE TEMP TABLE "{table}_added" ON COMMIT DROP AS '
+            f'SELECT {columns} FROM "{table}_new" EXCEPT SELECT {columns} FROM {target}')
+    condition = ' AND '.join(f't."{field.column_name}" = r."{field.column_name}"' for field in fields)
+    removed = execute(f'DELETE FROM {target} t USING "{table}_removed" r WHERE {condition}').rowcount
+    added = execute(f'INSERT INTO {target} ({columns}) SELECT {columns} FROM "{table}_added"').rowcount
+    return removed, added
+
+
+def refresh_usagi_concepts():
+    """Replace usagi concepts which are changed or have changed parent or child counts"""
+    parent_count = Parent_Count._meta.table_name
+    child_count = Child_Count._meta.table_name
+    execute(
+        'CREATE TEMP TABLE usagi_concept_ids ON COMMIT DROP AS '
+        'SELECT concept_id FROM changed_concept_ids '
+        f'UNION SELECT descendant_concept_id FROM "{parent_count}_removed" '
+        f'UNION SELECT descendant_concept_id FROM "{parent_count}_added" '
+        f'UNION SELECT ancestor_concept_id FROM "{child_count}_removed" '
+        f'UNION SELECT ancestor_concept_id FROM "{child_count}_added"'
+    )
+    deleted = execute('DELETE FROM usagi_data.concept '
+                      'WHERE concept_id IN (SELECT concept_id FROM usagi_concept_ids)').rowcount
+    inserted = execute(
+        f'INSERT INTO usagi_data.concept ({", ".join(USAGI_CONCEPT_COLUMNS)}, parent_count, child_count) '
+        f'SELECT {", ".join(f"c.{column}" for column in USAGI_CONCEPT_COLUMNS)}, p.parent_count, ch.child_count '
+        'FROM vocabulary.concept c '
+        'JOIN usagi_concept_ids i ON i.concept_id = c.concept_id '
+        'LEFT JOIN usagi_data.parent_count p ON p.descendant_concept_id = c.concept_id '
+        'LEFT JOIN usagi_data.child_count ch ON ch.ancestor_concept_id = c.concept_id'
+    ).rowcount
+    app.logger.info(f'{UConcept._meta.table_name}: removed {deleted}, inserted {inserted} rows')
+
+
+def refresh_concept_for_index():
+    """
+    Rebuild index terms of concepts affected by changes: changed concepts, concepts with changed synonyms,
+    targets of changed maps to relationships and targets of changed source concepts
+    """
+    maps_to = Maps_To_Relationship._meta.table_name
+    synonym_hash = Concept_Synonym_Hash._meta.table_name
+    execute(
+        'CREATE TEMP TABLE changed_term_concept_ids ON COMMIT DROP AS '
+        'SELECT concept_id FROM changed_concept_ids '
+        f'UNION SELECT concept_id FROM "{synonym_hash}_removed" '
+        f'UNION SELECT concept_id FROM "{synonym_hash}_added"'
+    )
+    execute(
+        'CREATE TEMP TABLE index_concept_ids ON COMMIT DROP AS '
+        'SELECT concept_id FROM changed_term_concept_ids '
+        f'UNION SELECT concept_id_2 FROM "{maps_to}_removed" '
+        f'UNION SELECT concept_id_2 FROM "{maps_to}_added" '
+        f'UNION SELECT m.concept_id_2 FROM usagi_data.{maps_to} m '
+        'JOIN changed_term_concept_ids c ON c.concept_id = m.concept_id_1'
+    )
+    deleted = execute('DELETE FROM usagi_data.concept_for_index '
+                      'WHERE concept_id IN (SELECT concept_id FROM index_concept_ids)').rowcount
+    concept_ids = SQL('(SELECT concept_id FROM index_concept_ids)')
+    columns = ', '.join(f'"{field.column_name}"' for field in CONCEPT_FOR_INDEX_FIELDS)
+    inserted = 0
+    for select in (select_concept_for_index, select_concept_for_index_2,
+                   select_concept_for_index_3, select_concept_for_index_4):
+        select_sql, params = select(concept_ids).sql()
+        inserted += execute(f'INSERT INTO usagi_data.concept_for_index ({columns}) {select_sql}', params).rowcount
+    app.logger.info(f'{Concept_For_Index._meta.table_name}: removed {deleted}, inserted {inserted} rows')
@@ -1,6 +1,16 @@
+import threading
+from typing import List, Optional
+
+from app import app
 from model.usagi.code_mapping_conversion import CodeMappingConversion
 from model.usagi.code_mapping_conversion_log import CodeMappingConversionLog
 from model.usagi.conversion_status import ConversionStatus
+from util.constants import PROGRESS_LOG_EVERY_CODES, PROGRESS_LOG_INTERVAL, STATUS_LOGS_LIMIT
+from util.throttled_progress import ThrottledProgress
+
+# {[conversion_id: int]: ThrottledProgress} of conversions running in this process
+_conversion_progress = {}
+_conversion_progress_lock = threading.Lock()
 
 
 def create_log(message: str,
@@ -16,12 +26,54 @@ def create_log(message: str,
     )
 
 
-def get_logs(conversion: CodeMappingConversion):
-    return CodeMappingConversionLog.select(
+def start_progress(conversion: CodeMappingConversion, total: int) -> ThrottledProgress:
+    """Track searched codes in memory, store progress log at most every N codes or T seconds"""
+    def flush(done: int, message: str):
+        create_log(message=message,
+                   percent=done * 100 // total,
+                   status=ConversionStatus.IN_PROGRESS,
+                   conversion=conversion)
+
+    progress = ThrottledProgress(total,
+                                 flush,
+                                 app.config.get('PROGRESS_LOG_EVERY_CODES', PROGRESS_LOG_EVERY_CODES),
+                                 app.config.get('PROGRESS_LOG_INTERVAL', PROGRESS_LOG_INTERVAL))
+    with _conversion_progress_lock:
+        _conversion_progress[conversion.id] = progress
+    return progress
+
+
+def finish_progress(conversion: CodeMappingConversion):
+    with _conversion_progress_lock:
+        _conversion_progress.pop(conversion.id, None)
+
+
+def get_progress(conversion: CodeMappingConversion) -> Optional[ThrottledProgress]:
+    with _conversion_progress_lock:
+        return _conversion_progress.get(conversion.id)
+
+
+def get_logs(conversion: CodeMappingConversion, limit: int = STATUS_LOGS_LIMIT) -> List[dict]:
+    """Last logs of conversion, with not stored progress of conversion running in this process"""
+    logs = list(CodeMappingConversionLog.select(
         CodeMappingConversionLog.message,
         CodeMappingConversionLog.status_code,
         CodeMappingConversionLog.status_name,
         CodeMappingConversionLog.percent
     ).where(
         CodeMappingConversionLog.conversion == conversion
-    ).dicts()
\ No newline at end of file
+    ).order_by(
+        CodeMappingConversionLog.id.desc()
+    ).limit(limit).dicts())
+    logs.reverse()
+    progress = get_progress(conversion)
+    if progress is not None and progress.message is not None \
+            and (not logs or logs[-1]['percent'] < progress.percent):
+        logs.append({
+            'message': progress.message,
+            'status_code': ConversionStatus.IN_PROGRESS.value,
+            'status_name': ConversionStatus.IN_PROGRESS.name,
+            'percent': progress.percent
+        })
+        logs = logs[-limit:]
+    return logs
\ No newline at end of file
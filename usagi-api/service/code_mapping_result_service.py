@@ -1,15 +1,134 @@
+import json
+import math
+import threading
+from typing import List, Optional
+
+from app import app
 from model.usagi.code_mapping_conversion import CodeMappingConversion
 from model.usagi.code_mapping_conversion_result import CodeMappingConversionResult
+from model.usagi.code_mapping_conversion_result_row import CodeMappingConversionResultRow
+from model.usagi.conversion_status import ConversionStatus
+from model.usagi_data.code_mapping import CodeMapping, CodeMappingEncoder, MappingStatus
 from service.code_mapping_conversion_service import get_conversion_by_username
+from util.constants import RESULT_ROWS_BATCH_SIZE
+from util.exception import InvalidUsage
+
+RESULT_SORT_FIELDS = {
+    'position': CodeMappingConversionResultRow.position,
+    'sourceCode': CodeMappingConversionResultRow.source_code,
+    'sourceName': CodeMappingConversionResultRow.source_name,
+    'sourceFrequency': CodeMappingConversionResultRow.source_frequency,
+    'mappingStatus': CodeMappingConversionResultRow.mapping_status,
+    'matchScore': CodeMappingConversionResultRow.match_score,
+}
+
+
+class CodeMappingResultWriter:
+    """Thread-safe buffer of code mappings, stores them to result rows by batches as source codes are mapped"""
+
+    def __init__(self, conversion: CodeMappingConversion, batch_size: int = None):
+        self.conversion = conversion
+        self.batch_size = batch_size or app.config.get('RESULT_ROWS_BATCH_SIZE', RESULT_ROWS_BATCH_SIZE)
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def add(self, position: int, code_mapping: CodeMapping):
+        row = _to_result_row(self.conversion, position, code_mapping)
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) < self.batch_size:
+                return
+            rows, self._rows = self._rows, []
+        CodeMappingConversionResultRow.insert_many(rows).execute()
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if rows:
+            CodeMappingConversionResultRow.insert_many(rows).execute()
+
 
+def _to_result_row(conversion: CodeMappingConversion, position: int, code_mapping: CodeMapping) -> dict:
+    source_code = code_mapping.sourceCode
+    return {
+        'conversion': conversion.id,
+        'position': position,
+        'source_code': None if source_code.source_code is None else str(source_code.source_code),
+        'source_name': source_code.source_name,
+        'source_frequency': source_code.source_frequency,
+        'mapping_status': MappingStatus(code_mapping.mappingStatus).value,
+        'match_score': code_mapping.matchScore,
+        'result': json.dumps(code_mapping, cls=CodeMappingEncoder),
+    }
 
-def create_code_mapping_result(result: str, conversion: CodeMappingConversion):
-    return CodeMappingConversionResult.create(
-        result=result,
-        conversion=conversion
-    )
 
+def delete_code_mapping_result_rows(conversion: CodeMappingConversion):
+    CodeMappingConversionResultRow.delete().where(CodeMappingConversionResultRow.conversion == conversion).execute()
 
-def get_code_mapping_result(conversion_id: int, username: str) -> CodeMappingConversionResult:
+
+def get_completed_conversion(conversion_id: int, username: str) -> CodeMappingConversion:
+    """Conversion with stored result, result of conversion in progress, aborted or failed is not found"""
     conversion = get_conversion_by_username(conversion_id, username)
-    return CodeMappingConversionResult.get(CodeMappingConversionResult.conversion == conversion)
+    if conversion.status_code != ConversionStatus.COMPLETED.value:
+        raise InvalidUsage('Code mapping result not found', 404)
+    return conversion
+
+
+def get_code_mapping_result(conversion_id: int, username: str) -> List[dict]:
+    """All code mappings of conversion in source codes order"""
+    conversion = get_completed_conversion(conversion_id, username)
+    rows = CodeMappingConversionResultRow \
+        .select(CodeMappingConversionResultRow.result) \
+        .where(CodeMappingConversionResultRow.conversion == conversion) \
+        .order_by(CodeMappingConversionResultRow.position) \
+        .tuples()
+    result = [json.loads(row[0]) for row in rows.iterator()]
+    if result:
+        return result
+    # Conversions completed before result rows were introduced, completed conversion without source codes has no rows
+    legacy_result = CodeMappingConversionResult.get_or_none(CodeMappingConversionResult.conversion == conversion)
+    return json.loads(legacy_result.result) if legacy_result is not None else []
+
+
+def get_code_mapping_result_page(conversion_id: int,
+                                 username: str,
+                                 page: int,
+                                 page_size: int,
+                                 sort: str = 'position',
+                                 order: str = 'asc',
+                                 statuses: Optional[List[str]] = None,
+                                 min_score: Optional[float] = None,
+                                 max_score: Optional[float] = None) -> dict:
+    if page < 1 or page_size < 1:
+        raise InvalidUsage('Page and page size must be positive', 400)
+    sort_field = RESULT_SORT_FIELDS.get(sort)
+    if sort_field is None:
+        raise InvalidUsage(f'Unsupported sort field {sort}', 400)
+    if order not in ('asc', 'desc'):
+        raise InvalidUsage(f'Unsupported sort order {order}', 400)
+    conversion = get_completed_conversion(conversion_id, username)
+
+    condition = CodeMappingConversionResultRow.conversion == conversion
+    if statuses:
+        condition &= CodeMappingConversionResultRow.mapping_status.in_(statuses)
+    if min_score is not None:
+        condition &= CodeMappingConversionResultRow.match_score >= min_score
+    if max_score is not None:
+        condition &= CodeMappingConversionResultRow.match_score <= max_score
+
+    total_count = CodeMappingConversionResultRow.select().where(condition).count()
+    order_by = [sort_field.asc() if order == 'asc' else sort_field.desc()]
+    if sort_field is not CodeMappingConversionResultRow.position:
+        order_by.append(CodeMappingConversionResultRow.position)
+    rows = CodeMappingConversionResultRow \
+        .select(CodeMappingConversionResultRow.result) \
+        .where(condition) \
+        .order_by(*order_by) \
+        .paginate(page, page_size) \
+        .tuples()
+
+    return {
+        'content': [json.loads(row[0]) for row in rows],
+        'totalElements': total_count,
+        'totalPages': math.ceil(total_count / page_size)
+    }
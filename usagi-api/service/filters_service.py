@@ -1,19 +1,39 @@
-import pysolr
+import hashlib
+import json
+from typing import Tuple
 
-from util.constants import SOLR_CONN_STRING, SOLR_FILTERS
+from app import app
+from util.constants import SOLR_FILTERS, FILTERS_CACHE_TTL
 from util.searh_util import DEFAULT_SOLR_QUERY
+from util.solr_client import get_solr
+from util.ttl_cache import TTLCache
 
+FILTERS_CACHE_KEY = 'filters'
 
-def get_filters():
-    solr = pysolr.Solr(SOLR_CONN_STRING, always_commit=True)
-    facets = {}
-    for key in SOLR_FILTERS:
-        params = {
-            'facet': 'on',
-            'facet.field': key,
-            'rows': '0',
-        }
-        results = solr.search(DEFAULT_SOLR_QUERY, **params)
-        facets_string_values = [x for x in results.facets['facet_fields'][key] if not isinstance(x, int)]
-        facets[SOLR_FILTERS[key]] = sorted(facets_string_values)
-    return facets
+# Facet values change only after Solr index build, which clears the cache.
+# TTL limits staleness when the index is built by another process
+filters_cache = TTLCache(max_size=1, ttl=app.config.get('FILTERS_CACHE_TTL', FILTERS_CACHE_TTL))
+
+
+def get_filters_with_etag() -> Tuple[dict, str]:
+    """Return cached filters and ETag of them"""
+    return filters_cache.get_or_compute(FILTERS_CACHE_KEY, _search_filters_with_etag)
+
+
+def _search_filters_with_etag() -> Tuple[dict, str]:
+    filters = search_filters()
+    etag = hashlib.md5(json.dumps(filters, sort_keys=True).encode('utf-8')).hexdigest()
+    return filters, etag
+
+
+def search_filters() -> dict:
+    """Values of all filter fields by one Solr request with a facet per field"""
+    params = {
+        'facet': 'on',
+        'facet.field': list(SOLR_FILTERS),
+        'rows': '0',
+    }
+    results = get_solr().search(DEFAULT_SOLR_QUERY, **params)
+    facet_fields = results.facets['facet_fields']
+    # Facet field values are [value, count, value, count, ...]
+    return {SOLR_FILTERS[key]: sorted(facet_fields[key][::2]) for key in SOLR_FILTERS}
@@ -1,44 +1,86 @@
-import pysolr
-from typing import List
+import json
+from typing import Dict, List
+from app import app
 from model.usagi_data.code_mapping import ScoredConcept, TargetConcept
 from model.usagi_data.concept import Concept
-from service.similarity_score_service import get_terms_vectors, cosine_sim_vectors
+from service.similarity_score_service import get_similarity_scores
 from util.array_util import remove_duplicates
-from util.constants import SOLR_CONN_STRING
+from util.constants import SEARCH_RESULT_SIZE, MAX_SEARCH_RESULT_SIZE, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, \
+    QUERY_SEARCH_MODE
 from util.searh_util import search_term_to_query
+from util.solr_client import get_solr
 from util.target_concept_util import create_target_concept
+from util.ttl_cache import TTLCache
 
 CONCEPT_TERM = "C"
 CONCEPT_TYPE_STRING	= "C"
-SEARCH_RESULT_SIZE = 100
+
+# Search by term results, cleared when Solr index is rebuilt
+search_results_cache = TTLCache(app.config.get('SEARCH_CACHE_SIZE', SEARCH_CACHE_SIZE),
+                                app.config.get('SEARCH_CACHE_TTL', SEARCH_CACHE_TTL))
 
 
 def count():
-    solr = pysolr.Solr(SOLR_CONN_STRING)
-    results = solr.search('*:*', rows=0)
+    results = get_solr().search('*:*', rows=0)
     return results.hits
 
 
+def get_search_result_size() -> int:
+    size = int(app.config.get('SEARCH_RESULT_SIZE', SEARCH_RESULT_SIZE))
+    return max(1, min(size, MAX_SEARCH_RESULT_SIZE))
+
+
 def search_usagi(filters, search_term: str, source_auto_assigned_concept_ids):
     if search_term is None:
         search_term = ''
-    solr = pysolr.Solr(SOLR_CONN_STRING, always_commit=True)
+    solr = get_solr()
     scored_concepts = []
     filter_queries = create_usagi_filter_queries(filters, source_auto_assigned_concept_ids) if filters else None
     search_query = search_term_to_query(search_term)
-    results = solr.search(search_query, fl='concept_id, term, score', fq=filter_queries, rows=SEARCH_RESULT_SIZE).docs
+    results = solr.search(search_query, fl='concept_id, term, score', fq=filter_queries, rows=get_search_result_size()).docs
     results = remove_duplicates(results)
-    vectors = get_terms_vectors(results, search_term, 'term')
+    scores = get_similarity_scores(search_term, [item['term'][0] for item in results])
+    concepts = get_concepts_by_ids([item['concept_id'] for item in results if 'concept_id' in item])
     for index, item in enumerate(results):
         if 'concept_id' in item:
-            concept: Concept = Concept.select().where(Concept.concept_id == item['concept_id']).get()
+            concept: Concept = concepts.get(int(item['concept_id']))
+            if concept is None:
+                continue
             target_concept: TargetConcept = create_target_concept(concept)
-            cosine_simiarity_score = float("{:.2f}".format(cosine_sim_vectors(vectors[0], vectors[index + 1])))
+            cosine_simiarity_score = float("{:.2f}".format(scores[index]))
             scored_concepts.append(ScoredConcept(cosine_simiarity_score, target_concept, item['term']))
     scored_concepts.sort(key=lambda x: x.match_score, reverse=True)
     return scored_concepts
 
 
+def search_usagi_cached(filters, search_term: str, source_auto_assigned_concept_ids):
+    key = create_search_cache_key(filters, search_term, source_auto_assigned_concept_ids)
+    return search_results_cache.get_or_compute(
+        key,
+        lambda: search_usagi(filters, search_term, source_auto_assigned_concept_ids)
+    )
+
+
+def create_search_cache_key(filters, search_term: str, source_auto_assigned_concept_ids) -> tuple:
+    """
+    Term field and similarity scores are case insensitive, so term is lowercased.
+    Query mode search string is kept as is, Solr operators are case sensitive
+    """
+    term = (search_term or '').strip()
+    if not filters or filters.get('searchMode') != QUERY_SEARCH_MODE:
+        term = term.lower()
+    concept_ids = tuple(sorted(str(concept_id) for concept_id in source_auto_assigned_concept_ids or []))
+    return term, json.dumps(filters, sort_keys=True), concept_ids
+
+
+def get_concepts_by_ids(concept_ids) -> Dict[int, Concept]:
+    """Load all concepts found by Solr in one query"""
+    ids = {int(concept_id) for concept_id in concept_ids}
+    if not ids:
+        return {}
+    return {concept.concept_id: concept for concept in Concept.select().where(Concept.concept_id.in_(list(ids)))}
+
+
 def create_usagi_filter_queries(filters, source_auto_assigned_concept_ids):
     queries = []
     add_filter_query_if_applied(queries, filters['filterByConceptClass'], filters['conceptClasses'], 'concept_class_id')
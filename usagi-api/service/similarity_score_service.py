@@ -1,17 +1,21 @@
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List
 
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
 
-def get_terms_vectors(results, query, field_name):
-    sentences = [query] + list(map(lambda x: x[field_name][0], results))
-    cleaned_sentences = list(map(lambda text : text.lower(), sentences))
-    vectorizer = CountVectorizer(analyzer='char_wb', ngram_range=(3,4))
-    fitted_vectorizer = vectorizer.fit_transform(cleaned_sentences)
-    vectors = fitted_vectorizer.toarray()
-    return vectors
+# Stateless char n-gram vectorizer, nothing is fitted per search and it is safe to share between threads.
+# Rows are l2 normalized, so dot product of two rows is their cosine similarity
+terms_vectorizer = HashingVectorizer(analyzer='char_wb',
+                                     ngram_range=(3, 4),
+                                     n_features=2 ** 20,
+                                     alternate_sign=False,
+                                     lowercase=True,
+                                     norm='l2')
 
 
-def cosine_sim_vectors(vec1, vec2):
-    vec1 = vec1.reshape(1, -1)
-    vec2 = vec2.reshape(1, -1)
-    return cosine_similarity(vec1, vec2)[0][0]
\ No newline at end of file
+def get_similarity_scores(query: str, terms: List[str]) -> np.ndarray:
+    """Return cosine similarity of query to each of terms, computed on sparse matrix in one operation"""
+    if not terms:
+        return np.zeros(0)
+    matrix = terms_vectorizer.transform([query] + terms)
+    return (matrix[1:] @ matrix[0].T).toarray().ravel()
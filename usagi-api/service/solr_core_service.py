@@ -1,36 +1,71 @@
-import json
-import urllib
-from urllib.request import urlopen
+import threading
+from typing import Optional
 from app import app
+from model.usagi_data.concept import Concept_For_Index
+from model.usagi_data.data_version import Solr_Index_Version
+from refresh_usagi_data_tables import get_built_vocabulary_version
 from service import search_service
-from util.constants import USAGI_CORE_NAME
+from service.filters_service import filters_cache
+from util.constants import USAGI_CORE_NAME, SOLR_INDEX_WORKERS, SOLR_INDEX_BATCH_SIZE, SOLR_INDEX_FETCH_SIZE, \
+    SOLR_INDEX_SOFT_COMMIT_INTERVAL, SOLR_INDEX_PROGRESS_INTERVAL
+from util.solr_client import get_solr
+from util.solr_indexer import SolrIndexer, iterate_rows, row_to_document
+from util.vocabulary_db import vocabulary_pg_db
 
+USAGI_INDEX_QUERY = 'SELECT type, term_type, term, concept_id, domain_id, vocabulary_id, concept_class_id, ' \
+                    'standard_concept FROM usagi_data.concept_for_index'
 
-def run_solr_command(command, current_user = ''):
-    resource = urllib.request.urlopen(f"{app.config['SOLR_URL']}/{command}{current_user}")
-    content = resource.read().decode(resource.headers.get_content_charset())
-    return content
+_index_lock = threading.Lock()
 
 
 def create_index_if_not_exist(logger):
-    count = search_service.count()
-    if count != 0:
-        logger.info("Usagi Solr data already imported")
-    else:
-        status_response_str = run_solr_command("solr/usagi/dataimport?command=status&indent=on&wt=json")
-        status_response = json.loads(status_response_str)
-        status = status_response['status']
-        if status == 'busy':
-            logger.info("The import data process has already started")
-        else:
-            db_host = app.config['VOCABULARY_DB_HOST']
-            dp_port = app.config['VOCABULARY_DB_PORT']
-            dp_name = app.config['VOCABULARY_DB_NAME']
-            db_user = app.config['VOCABULARY_DB_USER']
-            db_password = app.config['VOCABULARY_DB_PASSWORD']
-            full_import_command = f"solr/{USAGI_CORE_NAME}/dataimport?command=full-import" \
-                                  f"&jdbcurl=jdbc:postgresql://{db_host}:{dp_port}/{dp_name}" \
-                                  f"&jdbcuser={db_user}" \
-                                  f"&jdbcpassword={db_password}"
-            result = run_solr_command(full_import_command)
-            logger.info("Run solr data import command with result %s", result)
\ No newline at end of file
+    """
+    Index usagi concepts to Solr unless the core has a completed index of the built usagi data version.
+    Failed or interrupted index leaves no version, so it is retried on the next start
+    """
+    if not _index_lock.acquire(blocking=False):
+        logger.info("The import data process has already started")
+        return
+    vocabulary_pg_db.connect(reuse_if_open=True)
+    try:
+        vocabulary_version = get_built_vocabulary_version()
+        if is_index_completed(vocabulary_version):
+            logger.info("Usagi Solr data already imported")
+            return
+        index_usagi_concepts(logger, vocabulary_version)
+    finally:
+        vocabulary_pg_db.close()
+        _index_lock.release()
+
+
+def is_index_completed(vocabulary_version: Optional[str]) -> bool:
+    index_version = Solr_Index_Version.get_or_none(Solr_Index_Version.core == USAGI_CORE_NAME)
+    return index_version is not None and index_version.vocabulary_version == vocabulary_version
+
+
+def index_usagi_concepts(logger, vocabulary_version: Optional[str]):
+    """
+    Stream concept_for_index rows by a server-side cursor and post them to the usagi core by parallel workers.
+    Index version of the core is deleted first and created after the final commit
+    """
+    Solr_Index_Version.delete().where(Solr_Index_Version.core == USAGI_CORE_NAME).execute()
+    search_service.search_results_cache.clear()
+    indexer = SolrIndexer(get_solr(USAGI_CORE_NAME),
+                          USAGI_CORE_NAME,
+                          workers=app.config.get('SOLR_INDEX_WORKERS', SOLR_INDEX_WORKERS),
+                          batch_size=app.config.get('SOLR_INDEX_BATCH_SIZE', SOLR_INDEX_BATCH_SIZE),
+                          soft_commit_interval=app.config.get('SOLR_INDEX_SOFT_COMMIT_INTERVAL',
+                                                              SOLR_INDEX_SOFT_COMMIT_INTERVAL),
+                          progress_interval=app.config.get('SOLR_INDEX_PROGRESS_INTERVAL',
+                                                           SOLR_INDEX_PROGRESS_INTERVAL),
+                          logger=logger)
+    total = Concept_For_Index.select().count()
+    with vocabulary_pg_db.atomic():
+        rows = iterate_rows(vocabulary_pg_db.connection(),
+                            USAGI_INDEX_QUERY,
+                            app.config.get('SOLR_INDEX_FETCH_SIZE', SOLR_INDEX_FETCH_SIZE))
+        progress = indexer.index((row_to_document(row) for row in rows), total)
+    Solr_Index_Version.create(core=USAGI_CORE_NAME, vocabulary_version=vocabulary_version, documents=progress.done)
+    search_service.search_results_cache.clear()
+    filters_cache.clear()
+    logger.info(f"Usagi Solr data imported: {progress.done} documents in {progress.elapsed:.0f}s")
@@ -1,4 +1,5 @@
-from typing import List
+from typing import Dict, Iterable, List
+from peewee import fn, Value
 from model.usagi_data.atc_to_rxnorm import atc_to_rxnorm
 from model.usagi_data.source_code import SourceCode
 from util.constants import CONCEPT_IDS
@@ -11,20 +12,34 @@ def create_source_codes(codes,
                         auto_concept_id_column,
                         concept_ids_or_atc,
                         additional_info_columns) -> List[SourceCode]:
-    source_codes = []
-    for row in codes:
-        if 'selected' in row:
-            if row['selected']:
-                source_code = create_source_code(row,
-                                                 source_code_column,
-                                                 source_name_column,
-                                                 source_frequency_column,
-                                                 auto_concept_id_column,
-                                                 concept_ids_or_atc,
-                                                 additional_info_columns,
-                                                 row)
-                source_codes.append(source_code)
-    return source_codes
+    selected_rows = [row for row in codes if row.get('selected')]
+    atc_to_rxnorm_map = None
+    if auto_concept_id_column and concept_ids_or_atc != CONCEPT_IDS:
+        atc_to_rxnorm_map = get_atc_to_rxnorm_map(str(row[auto_concept_id_column]) for row in selected_rows)
+    return [create_source_code(row,
+                               source_code_column,
+                               source_name_column,
+                               source_frequency_column,
+                               auto_concept_id_column,
+                               concept_ids_or_atc,
+                               additional_info_columns,
+                               row,
+                               atc_to_rxnorm_map)
+            for row in selected_rows]
+
+
+def get_atc_to_rxnorm_map(atc_codes: Iterable[str]) -> Dict[str, List[int]]:
+    """RxNorm concept ids of ATC codes by one query, codes without RxNorm concepts are not in the map"""
+    atc_codes = list(set(atc_codes))
+    atc_to_rxnorm_map: Dict[str, List[int]] = {}
+    if not atc_codes:
+        return atc_to_rxnorm_map
+    query = atc_to_rxnorm.select(atc_to_rxnorm.concept_code, atc_to_rxnorm.concept_id_2).where(
+        atc_to_rxnorm.concept_code == fn.ANY(Value(atc_codes, unpack=False, converter=False))
+    ).tuples()
+    for concept_code, concept_id_2 in query:
+        atc_to_rxnorm_map.setdefault(concept_code, []).append(concept_id_2)
+    return atc_to_rxnorm_map
 
 
 def create_source_code(row,
@@ -34,7 +49,8 @@ def create_source_code(row,
                        auto_concept_id_column,
                        concept_ids_or_atc,
                        additional_info_columns,
-                       code) -> SourceCode:
+                       code,
+                       atc_to_rxnorm_map: Dict[str, List[int]] = None) -> SourceCode:
     new_code = SourceCode()
     new_code.code = code
     if not source_code_column:
@@ -54,10 +70,10 @@ def create_source_code(row,
                     new_code.source_auto_assigned_concept_ids.add(
                         int(concept_id))
         else:
-            concept_id_2_query = atc_to_rxnorm.select().where(atc_to_rxnorm.concept_code == row[auto_concept_id_column])
-            for item in concept_id_2_query:
-                new_code.source_auto_assigned_concept_ids = new_code.source_auto_assigned_concept_ids.add(
-                    item.concept_id_2)
+            atc_code = str(row[auto_concept_id_column])
+            if atc_to_rxnorm_map is None:
+                atc_to_rxnorm_map = get_atc_to_rxnorm_map([atc_code])
+            new_code.source_auto_assigned_concept_ids = set(atc_to_rxnorm_map.get(atc_code, []))
     if additional_info_columns:
         new_code.source_additional_info.append({additional_info_columns: row[additional_info_columns]})
     return new_code
\ No newline at end of file
@@ -1,30 +1,63 @@
+from typing import Iterator
+
 from model.vocabulary.source_to_concept_map import SourceToConceptMap
+from util.bulk_loader import BulkLoader
 from util.vocabulary_db import vocabulary_pg_db
 
+SOURCE_TO_CONCEPT_MAP_FIELDS = [
+    SourceToConceptMap.source_concept_id,
+    SourceToConceptMap.source_code,
+    SourceToConceptMap.source_vocabulary_id,
+    SourceToConceptMap.source_code_description,
+    SourceToConceptMap.target_concept_id,
+    SourceToConceptMap.target_vocabulary_id,
+    SourceToConceptMap.valid_start_date,
+    SourceToConceptMap.valid_end_date,
+    SourceToConceptMap.invalid_reason,
+    SourceToConceptMap.username,
+]
+SOURCE_TO_CONCEPT_MAP_STAGING_TABLE = 'source_to_concept_map_staging'
+
 
 def save_source_to_concept_map(mapped_codes, snapshot_name: str, username: str):
+    """
+    Replace rows of snapshot by approved mappings. Rows are copied to a temp staging table first,
+    then old rows are deleted and new rows are inserted by two set-based statements, so target table rows are locked
+    only for the swap
+    """
+    columns = [field.column_name for field in SOURCE_TO_CONCEPT_MAP_FIELDS]
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    target = f'"{SourceToConceptMap._meta.schema}"."{SourceToConceptMap._meta.table_name}"'
     with vocabulary_pg_db.atomic():
+        vocabulary_pg_db.execute_sql(f'CREATE TEMP TABLE "{SOURCE_TO_CONCEPT_MAP_STAGING_TABLE}" ON COMMIT DROP AS '
+                                     f'SELECT {column_list} FROM {target} WITH NO DATA')
+        with BulkLoader(vocabulary_pg_db, 'pg_temp', SOURCE_TO_CONCEPT_MAP_STAGING_TABLE, columns) as loader:
+            loader.copy_rows(create_source_to_concept_map_rows(mapped_codes, snapshot_name, username))
+
         delete_source_to_concept_by_snapshot_name(snapshot_name, username)
+        vocabulary_pg_db.execute_sql(f'INSERT INTO {target} ({column_list}) '
+                                     f'SELECT {column_list} FROM "{SOURCE_TO_CONCEPT_MAP_STAGING_TABLE}"')
+
 
-        for item in mapped_codes:
-            if 'approved' in item and item['approved']:
-                source_code = item['sourceCode']['source_code']
-                source_code_description = item['sourceCode']['source_name']
-                for concept in item['targetConcepts']:
-                    mapped_code_data = {
-                        "source_concept_id": 0,
-                        "source_code": source_code,
-                        "source_vocabulary_id": snapshot_name,
-                        "source_code_description": source_code_description,
-                        "target_concept_id": concept['concept']['conceptId'],
-                        "target_vocabulary_id": "None" if concept['concept']['vocabularyId'] == "0" else
-                        concept['concept']['vocabularyId'],
-                        "valid_start_date": "1970-01-01",
-                        "valid_end_date": "2099-12-31",
-                        "invalid_reason": "",
-                        "username": username
-                    }
-                    SourceToConceptMap.create(**mapped_code_data)
+def create_source_to_concept_map_rows(mapped_codes, snapshot_name: str, username: str) -> Iterator[tuple]:
+    """Rows of approved target concepts with values in SOURCE_TO_CONCEPT_MAP_FIELDS order"""
+    for item in mapped_codes:
+        if 'approved' in item and item['approved']:
+            source_code = item['sourceCode']['source_code']
+            source_code_description = item['sourceCode']['source_name']
+            for concept in item['targetConcepts']:
+                yield (
+                    0,
+                    source_code,
+                    snapshot_name,
+                    source_code_description,
+                    concept['concept']['conceptId'],
+                    "None" if concept['concept']['vocabularyId'] == "0" else concept['concept']['vocabularyId'],
+                    "1970-01-01",
+                    "2099-12-31",
+                    "",
+                    username,
+                )
 
 
 def delete_source_to_concept_by_snapshot_name(snapshot_name: str, username: str):
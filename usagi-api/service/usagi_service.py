@@ -1,22 +1,29 @@
-import json
 import traceback
-from typing import List
+from typing import Dict, List, Tuple
 
 from app import app
 from model.usagi.code_mapping_conversion import CodeMappingConversion
 from model.usagi.conversion_status import ConversionStatus
-from model.usagi_data.code_mapping import CodeMappingEncoder, CodeMapping, MappingTarget, MappingStatus
+from model.usagi_data.code_mapping import CodeMapping, MappingTarget, MappingStatus, ScoredConcept
+from model.usagi_data.source_code import SourceCode
 from service.code_mapping_conversion_service import update_conversion, create_conversion, get_conversion
-from service.code_mapping_log_service import create_log
-from service.code_mapping_result_service import create_code_mapping_result, get_code_mapping_result
+from service.code_mapping_log_service import create_log, start_progress, finish_progress
+from service.code_mapping_result_service import CodeMappingResultWriter, get_code_mapping_result, \
+    delete_code_mapping_result_rows
 from service.code_mapping_snapshot_service import create_or_update_snapshot
 from service.search_service import search_usagi
 from service.source_codes_service import create_source_codes
 from service.source_to_concept_map_service import save_source_to_concept_map
 from service.store_csv_service import store_and_parse_csv
 from util.async_directive import fire_and_forget_concept_mapping
+from util.cancellation import conversion_cancellation_registry
+from util.constants import CONCEPT_MAPPING_WORKERS, CONCEPT_MAPPING_SOLR_RATE_LIMIT, CONCEPT_MAPPING_MULTI_PROCESS, \
+    CONVERSION_ABORT_CHECK_INTERVAL
 from util.exception import InvalidUsage
+from util.rate_limiter import RateLimiter
 from util.usagi_db import usagi_pg_db
+from util.vocabulary_db import vocabulary_pg_db
+from util.worker_pool import map_ordered
 
 
 def extract_codes_from_csv(file, delimiter, username):
@@ -42,7 +49,16 @@ def create_concept_mapping(username: str,
                            additional_info_columns):
     if usagi_pg_db.is_closed():
         usagi_pg_db.connect()
+    # Token is registered by the decorator before the task starts, abort requested since then is kept in it
+    cancellation_token = conversion_cancellation_registry.get(conversion.id) \
+        or conversion_cancellation_registry.register(conversion.id)
     try:
+        if app.config.get('CONCEPT_MAPPING_MULTI_PROCESS', CONCEPT_MAPPING_MULTI_PROCESS):
+            # Abort request can be handled by another process, only DB status is shared
+            cancellation_token.set_db_check(
+                lambda: get_conversion(conversion.id).status_code == ConversionStatus.ABORTED.value,
+                app.config.get('CONVERSION_ABORT_CHECK_INTERVAL', CONVERSION_ABORT_CHECK_INTERVAL)
+            )
         source_codes = create_source_codes(codes,
                                            source_code_column,
                                            source_name_column,
@@ -50,38 +66,37 @@ def create_concept_mapping(username: str,
                                            auto_concept_id_column,
                                            concept_ids_or_atc,
                                            additional_info_columns)
-        mapping_list: List[CodeMapping] = []
-        for idx, source_code in enumerate(source_codes):
-            conversion_from_db = get_conversion(conversion.id)
-            if conversion_from_db.status_code == ConversionStatus.ABORTED.value:
-                return
-            code_mapping = CodeMapping()
-            code_mapping.sourceCode = source_code
-            code_mapping.sourceCode.source_auto_assigned_concept_ids = []
-            if code_mapping.sourceCode.source_auto_assigned_concept_ids:
-                code_mapping.sourceCode.source_auto_assigned_concept_ids = \
-                    list(code_mapping.sourceCode.source_auto_assigned_concept_ids)
-            create_log(message=f"Searching {source_code.source_name}",
-                       percent=100 // len(source_codes) * idx,
-                       status=ConversionStatus.IN_PROGRESS,
-                       conversion=conversion)
-            scored_concepts = search_usagi(filters, source_code.source_name,
-                                           source_code.source_auto_assigned_concept_ids)
-            if len(scored_concepts):
-                target_concept = MappingTarget(concept=scored_concepts[0].concept, createdBy='<auto>',
-                                               term=scored_concepts[0].term)
-                code_mapping.targetConcepts = [target_concept]
-                code_mapping.matchScore = scored_concepts[0].match_score
-            else:
-                code_mapping.targetConcept = None
-                code_mapping.matchScore = 0
-            if len(source_code.source_auto_assigned_concept_ids) == 1 and len(scored_concepts):
-                code_mapping.mappingStatus = MappingStatus.AUTO_MAPPED_TO_1
-            elif len(source_code.source_auto_assigned_concept_ids) > 1 and len(scored_concepts):
-                code_mapping.mappingStatus = MappingStatus.AUTO_MAPPED
-            mapping_list.append(code_mapping)
-
-        create_code_mapping_result(json.dumps(mapping_list, cls=CodeMappingEncoder), conversion)
+        solr_rate_limiter = RateLimiter(app.config.get('CONCEPT_MAPPING_SOLR_RATE_LIMIT',
+                                                       CONCEPT_MAPPING_SOLR_RATE_LIMIT))
+
+        progress = start_progress(conversion, len(source_codes))
+        result_writer = CodeMappingResultWriter(conversion)
+
+        def map_source_codes_group(group_idx: int, group: List[Tuple[int, SourceCode]]):
+            """Codes of a group have the same search key, they are searched once"""
+            first_source_code = group[0][1]
+            progress.step(f"Searching {first_source_code.source_name}", len(group))
+            solr_rate_limiter.acquire()
+            scored_concepts = search_usagi(filters, first_source_code.source_name,
+                                           first_source_code.source_auto_assigned_concept_ids)
+            for idx, source_code in group:
+                result_writer.add(idx, create_code_mapping(source_code, scored_concepts))
+
+        if cancellation_token.is_cancelled():
+            delete_code_mapping_result_rows(conversion)
+            return
+
+        completed = map_ordered(map_source_codes_group,
+                                group_source_codes(source_codes),
+                                app.config.get('CONCEPT_MAPPING_WORKERS', CONCEPT_MAPPING_WORKERS),
+                                should_stop=cancellation_token.is_cancelled,
+                                on_worker_start=_connect_worker_databases,
+                                on_worker_stop=_close_worker_databases)
+        if completed is None or cancellation_token.is_cancelled():
+            delete_code_mapping_result_rows(conversion)
+            return
+
+        result_writer.flush()
         update_conversion(conversion.id, ConversionStatus.COMPLETED)
         create_log(message="Import finished",
                    percent=100,
@@ -89,6 +104,7 @@ def create_concept_mapping(username: str,
                    conversion=conversion)
     except Exception as error:
         update_conversion(conversion.id, ConversionStatus.FAILED)
+        delete_code_mapping_result_rows(conversion)
         error_message = error.__str__()
         create_log(message=error_message,
                    percent=100,
@@ -97,13 +113,67 @@ def create_concept_mapping(username: str,
         app.logger.error(error_message)
         traceback.print_tb(error.__traceback__)
     finally:
+        conversion_cancellation_registry.unregister(conversion.id)
+        finish_progress(conversion)
         if not usagi_pg_db.is_closed():
             usagi_pg_db.close()
 
 
+def prepare_source_code(source_code: SourceCode):
+    if source_code.source_auto_assigned_concept_ids:
+        source_code.source_auto_assigned_concept_ids = list(source_code.source_auto_assigned_concept_ids)
+    else:
+        source_code.source_auto_assigned_concept_ids = []
+
+
+def group_source_codes(source_codes: List[SourceCode]) -> List[List[Tuple[int, SourceCode]]]:
+    """
+    Group source codes with (index in source codes) by normalized source name and auto assigned concept ids.
+    Search by term is case insensitive, so codes of a group have the same search result
+    """
+    groups: Dict[tuple, List[Tuple[int, SourceCode]]] = {}
+    for idx, source_code in enumerate(source_codes):
+        prepare_source_code(source_code)
+        source_name = '' if source_code.source_name is None else str(source_code.source_name)
+        key = (source_name.strip().lower(),
+               tuple(sorted(source_code.source_auto_assigned_concept_ids)))
+        groups.setdefault(key, []).append((idx, source_code))
+    return list(groups.values())
+
+
+def create_code_mapping(source_code: SourceCode, scored_concepts: List[ScoredConcept]) -> CodeMapping:
+    code_mapping = CodeMapping()
+    code_mapping.sourceCode = source_code
+    if len(scored_concepts):
+        target_concept = MappingTarget(concept=scored_concepts[0].concept, createdBy='<auto>',
+                                       term=scored_concepts[0].term)
+        code_mapping.targetConcepts = [target_concept]
+        code_mapping.matchScore = scored_concepts[0].match_score
+    else:
+        code_mapping.targetConcept = None
+        code_mapping.matchScore = 0
+    if len(source_code.source_auto_assigned_concept_ids) == 1 and len(scored_concepts):
+        code_mapping.mappingStatus = MappingStatus.AUTO_MAPPED_TO_1
+    elif len(source_code.source_auto_assigned_concept_ids) > 1 and len(scored_concepts):
+        code_mapping.mappingStatus = MappingStatus.AUTO_MAPPED
+    return code_mapping
+
+
+def _connect_worker_databases():
+    """Peewee keeps connection per thread, each mapping worker uses its own connections"""
+    usagi_pg_db.connect(reuse_if_open=True)
+    vocabulary_pg_db.connect(reuse_if_open=True)
+
+
+def _close_worker_databases():
+    if not usagi_pg_db.is_closed():
+        usagi_pg_db.close()
+    if not vocabulary_pg_db.is_closed():
+        vocabulary_pg_db.close()
+
+
 def get_concept_mapping_result(conversion_id: int, username: str):
-    code_mapping_result = get_code_mapping_result(conversion_id, username)
-    return json.loads(code_mapping_result.result)
+    return get_code_mapping_result(conversion_id, username)
 
 
 def save_concept_mapping_result(username,
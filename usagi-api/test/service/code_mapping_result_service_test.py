@@ -0,0 +1,87 @@
+import json
+import os
+import unittest
+
+from peewee import SqliteDatabase
+
+os.environ.setdefault('USAGI_ENV', 'local')
+
+from model.usagi.code_mapping_conversion import CodeMappingConversion
+from model.usagi.code_mapping_conversion_result import CodeMappingConversionResult
+from model.usagi.code_mapping_conversion_result_row import CodeMappingConversionResultRow
+from model.usagi.conversion_status import ConversionStatus
+from service.code_mapping_result_service import get_code_mapping_result, get_code_mapping_result_page
+from util.exception import InvalidUsage
+
+MODELS = [CodeMappingConversion, CodeMappingConversionResult, CodeMappingConversionResultRow]
+TABLES_SQL = [
+    'CREATE TABLE usagi.code_mapping_conversion '
+    '(id INTEGER PRIMARY KEY, username TEXT, status_code INTEGER, status_name TEXT)',
+    'CREATE TABLE usagi.code_mapping_conversion_result '
+    '(id INTEGER PRIMARY KEY, time DATETIME, result TEXT, conversion_id INTEGER)',
+    'CREATE TABLE usagi.code_mapping_conversion_result_row '
+    '(id INTEGER PRIMARY KEY, conversion_id INTEGER, position INTEGER, source_code TEXT, source_name TEXT, '
+    'source_frequency INTEGER, mapping_status TEXT, match_score REAL, result TEXT)',
+]
+
+
+class CodeMappingResultServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.db = SqliteDatabase(':memory:')
+        self.db.connect()
+        self.db.execute_sql("ATTACH DATABASE ':memory:' AS usagi")
+        self.db.bind(MODELS, bind_refs=False, bind_backrefs=False)
+        # SQLite does not support schema-qualified references of peewee DDL, tables are created by plain SQL
+        for table_sql in TABLES_SQL:
+            self.db.execute_sql(table_sql)
+        self.username = 'user'
+
+    def tearDown(self):
+        self.db.close()
+
+    def create_conversion(self, status: ConversionStatus) -> CodeMappingConversion:
+        return CodeMappingConversion.create(username=self.username, status_code=status.value, status_name=status.name)
+
+    def create_row(self, conversion: CodeMappingConversion, position: int, status: str, score: float):
+        CodeMappingConversionResultRow.create(conversion=conversion, position=position, source_code=str(position),
+                                              source_name=f'code {position}', mapping_status=status,
+                                              match_score=score, result=json.dumps({'position': position}))
+
+    def test_completed_conversion_without_codes_has_empty_result(self):
+        conversion = self.create_conversion(ConversionStatus.COMPLETED)
+
+        page = get_code_mapping_result_page(conversion.id, self.username, page=1, page_size=10)
+
+        self.assertEqual({'content': [], 'totalElements': 0, 'totalPages': 0}, page)
+        self.assertEqual([], get_code_mapping_result(conversion.id, self.username))
+
+    def test_result_of_not_completed_conversion_not_found(self):
+        for status in (ConversionStatus.IN_PROGRESS, ConversionStatus.ABORTED, ConversionStatus.FAILED):
+            conversion = self.create_conversion(status)
+            with self.assertRaises(InvalidUsage) as page_error:
+                get_code_mapping_result_page(conversion.id, self.username, page=1, page_size=10)
+            with self.assertRaises(InvalidUsage) as result_error:
+                get_code_mapping_result(conversion.id, self.username)
+            self.assertEqual(404, page_error.exception.status_code)
+            self.assertEqual(404, result_error.exception.status_code)
+
+    def test_result_page(self):
+        conversion = self.create_conversion(ConversionStatus.COMPLETED)
+        self.create_row(conversion, 0, 'APPROVED', 0.5)
+        self.create_row(conversion, 1, 'UNCHECKED', 0.9)
+        self.create_row(conversion, 2, 'APPROVED', 0.7)
+
+        page = get_code_mapping_result_page(conversion.id, self.username, page=1, page_size=1,
+                                            sort='matchScore', order='desc', statuses=['APPROVED'])
+
+        self.assertEqual({'content': [{'position': 2}], 'totalElements': 2, 'totalPages': 2}, page)
+
+    def test_legacy_result(self):
+        conversion = self.create_conversion(ConversionStatus.COMPLETED)
+        CodeMappingConversionResult.create(conversion=conversion, result=json.dumps([{'position': 0}]))
+
+        self.assertEqual([{'position': 0}], get_code_mapping_result(conversion.id, self.username))
+
+
+if __name__ == '__main__':
+    unittest.main()
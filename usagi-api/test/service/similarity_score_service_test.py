@@ -0,0 +1,24 @@
+import unittest
+
+from service.similarity_score_service import get_similarity_scores
+
+
+class SimilarityScoreServiceTest(unittest.TestCase):
+    def test_get_similarity_scores(self):
+        scores = get_similarity_scores('Pulse', ['pulse', 'Pulse rate', 'Diastolic blood pressure'])
+
+        self.assertEqual(3, len(scores))
+        self.assertAlmostEqual(1.0, scores[0])
+        self.assertGreater(scores[1], scores[2])
+
+    def test_empty_query(self):
+        scores = get_similarity_scores('', ['pulse'])
+
+        self.assertEqual(0, scores[0])
+
+    def test_no_terms(self):
+        self.assertEqual(0, len(get_similarity_scores('pulse', [])))
+
+
+if __name__ == '__main__':
+    unittest.main()
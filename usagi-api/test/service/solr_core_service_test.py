@@ -0,0 +1,124 @@
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from peewee import SqliteDatabase
+
+os.environ.setdefault('USAGI_ENV', 'local')
+
+from model.usagi_data.concept import Concept_For_Index
+from model.usagi_data.data_version import Usagi_Data_Version, Solr_Index_Version
+from service import solr_core_service
+from service.solr_core_service import create_index_if_not_exist, is_index_completed
+
+MODELS = [Concept_For_Index, Usagi_Data_Version, Solr_Index_Version]
+# SQLite does not support schema-qualified indexes of peewee DDL, tables are created by plain SQL
+TABLES_SQL = [
+    'CREATE TABLE usagi_data.concept_for_index (id INTEGER PRIMARY KEY, type TEXT, term_type TEXT, term TEXT, '
+    'concept_id INTEGER, domain_id TEXT, vocabulary_id TEXT, concept_class_id TEXT, standard_concept TEXT)',
+    'CREATE TABLE usagi_data.usagi_data_version (id INTEGER PRIMARY KEY, vocabulary_version TEXT, '
+    'incremental INTEGER, built_at DATETIME)',
+    'CREATE TABLE usagi_data.solr_index_version (core TEXT PRIMARY KEY, vocabulary_version TEXT, '
+    'documents INTEGER, indexed_at DATETIME)',
+]
+ROWS = [{'concept_id': i, 'term': f'term {i}', 'standard_concept': None} for i in range(3)]
+
+
+class UsagiDataSqliteDatabase(SqliteDatabase):
+    """SQLite database with usagi_data schema attached to each connection, the service closes connections"""
+
+    def __init__(self, path: str, usagi_data_path: str):
+        super().__init__(path)
+        self.usagi_data_path = usagi_data_path
+
+    def _connect(self):
+        connection = super()._connect()
+        connection.execute('ATTACH DATABASE ? AS usagi_data', (self.usagi_data_path,))
+        return connection
+
+
+class LocalSolr:
+    """Stand-in of a Solr core with pysolr.Solr add, delete and commit methods"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.documents = []
+        self.commits = []
+
+    def add(self, docs, commit=None, overwrite=None):
+        if self.fail:
+            raise ConnectionError('Solr is not available')
+        self.documents.extend(docs)
+
+    def delete(self, q=None, commit=None):
+        self.documents = []
+
+    def commit(self, softCommit=False):
+        self.commits.append('soft' if softCommit else 'hard')
+
+
+class SolrCoreServiceTest(unittest.TestCase):
+    logger = logging.getLogger(__name__)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = UsagiDataSqliteDatabase(os.path.join(self.directory.name, 'vocabulary.db'),
+                                          os.path.join(self.directory.name, 'usagi_data.db'))
+        self.db.bind(MODELS, bind_refs=False, bind_backrefs=False)
+        with self.db.connection_context():
+            for table_sql in TABLES_SQL:
+                self.db.execute_sql(table_sql)
+        patchers = [mock.patch.object(solr_core_service, 'vocabulary_pg_db', self.db),
+                    mock.patch.object(solr_core_service, 'iterate_rows', lambda *args: iter(ROWS))]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if not self.db.is_closed():
+            self.db.close()
+        self.directory.cleanup()
+
+    def create_index(self, solr: LocalSolr):
+        with mock.patch.object(solr_core_service, 'get_solr', return_value=solr):
+            create_index_if_not_exist(self.logger)
+
+    def test_failed_index_is_retried_on_next_start(self):
+        Usagi_Data_Version.create(vocabulary_version='v1')
+
+        failing_solr = LocalSolr(fail=True)
+        with self.assertRaises(ConnectionError):
+            self.create_index(failing_solr)
+        self.assertEqual([], failing_solr.commits)
+        self.assertFalse(is_index_completed('v1'))
+
+        solr = LocalSolr()
+        self.create_index(solr)
+        self.assertEqual(3, len(solr.documents))
+        self.assertEqual(['hard'], solr.commits)
+        self.assertTrue(is_index_completed('v1'))
+
+    def test_index_is_rebuilt_when_data_version_changes(self):
+        Usagi_Data_Version.create(vocabulary_version='v1')
+        self.create_index(LocalSolr())
+
+        not_changed_solr = LocalSolr()
+        self.create_index(not_changed_solr)
+        self.assertEqual([], not_changed_solr.commits)
+
+        Usagi_Data_Version.create(vocabulary_version='v2')
+        with self.assertRaises(ConnectionError):
+            self.create_index(LocalSolr(fail=True))
+        self.assertFalse(is_index_completed('v1'))
+        self.assertFalse(is_index_completed('v2'))
+
+        solr = LocalSolr()
+        self.create_index(solr)
+        self.assertEqual(3, len(solr.documents))
+        self.assertTrue(is_index_completed('v2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
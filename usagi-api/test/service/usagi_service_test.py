@@ -0,0 +1,48 @@
+import os
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault('USAGI_ENV', 'local')
+
+from model.usagi.conversion_status import ConversionStatus
+from service import usagi_service
+from util.async_directive import cancel_concept_mapping_task
+from util.cancellation import conversion_cancellation_registry
+
+
+class CreateConceptMappingTest(unittest.TestCase):
+    def test_abort_before_mapping_loop_starts(self):
+        username = 'user'
+        conversion = SimpleNamespace(id=1001)
+        source_codes = [SimpleNamespace(source_name='Pulse', source_auto_assigned_concept_ids=None)]
+        finished = threading.Event()
+
+        def create_source_codes_and_abort(*args):
+            # Abort request is handled while source codes are created
+            cancel_concept_mapping_task(username, conversion.id)
+            return source_codes
+
+        with mock.patch.multiple(usagi_service,
+                                 usagi_pg_db=mock.DEFAULT,
+                                 create_source_codes=mock.Mock(side_effect=create_source_codes_and_abort),
+                                 start_progress=mock.DEFAULT,
+                                 CodeMappingResultWriter=mock.DEFAULT,
+                                 search_usagi=mock.DEFAULT,
+                                 update_conversion=mock.DEFAULT,
+                                 create_log=mock.DEFAULT,
+                                 delete_code_mapping_result_rows=mock.DEFAULT,
+                                 finish_progress=mock.Mock(side_effect=lambda c: finished.set())) as mocks:
+            usagi_service.create_concept_mapping(username, conversion, [], {}, 'code', 'name', None, None, None, None)
+            self.assertTrue(finished.wait(5))
+
+        mocks['search_usagi'].assert_not_called()
+        mocks['delete_code_mapping_result_rows'].assert_called_once_with(conversion)
+        self.assertNotIn(mock.call(conversion.id, ConversionStatus.COMPLETED),
+                         mocks['update_conversion'].call_args_list)
+        self.assertIsNone(conversion_cancellation_registry.get(conversion.id))
+
+
+if __name__ == '__main__':
+    unittest.main()
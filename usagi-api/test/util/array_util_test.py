@@ -0,0 +1,26 @@
+import unittest
+
+from util.array_util import remove_duplicates
+
+
+class ArrayUtilTest(unittest.TestCase):
+    def test_remove_duplicates_keeps_first_occurrence_order(self):
+        results = [
+            {'concept_id': 2, 'term': ['Pulse'], 'score': 3.0},
+            {'concept_id': 1, 'term': ['Pulse rate'], 'score': 2.0},
+            {'concept_id': 2, 'term': ['Pulse'], 'score': 1.0},
+            {'concept_id': 2, 'term': ['Heart rate'], 'score': 0.5},
+        ]
+
+        unique_results = remove_duplicates(results)
+
+        self.assertEqual([results[0], results[1], results[3]], unique_results)
+
+    def test_remove_duplicates_large_result(self):
+        results = [{'concept_id': i % 500, 'term': [f'term {i % 500}']} for i in range(1000)]
+
+        self.assertEqual(results[:500], remove_duplicates(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
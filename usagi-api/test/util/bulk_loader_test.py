@@ -0,0 +1,45 @@
+import csv
+import io
+import unittest
+from datetime import date
+
+import pandas as pd
+
+from util.bulk_loader import RowsCsvStream, data_frame_rows
+
+
+class BulkLoaderTest(unittest.TestCase):
+    def test_rows_csv_stream(self):
+        rows = [(1, 'Pulse', None, date(2020, 1, 2)), (2, '', 'a "quoted", value', date(2021, 3, 4))]
+        stream = RowsCsvStream(rows)
+
+        chunks = []
+        while True:
+            chunk = stream.read(7)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        self.assertEqual('1,"Pulse",,2020-01-02\n2,"","a ""quoted"", value",2021-03-04\n', ''.join(chunks))
+        self.assertEqual(2, stream.row_count)
+
+    def test_rows_csv_stream_large(self):
+        rows = ((i, f'term {i}') for i in range(100000))
+        stream = RowsCsvStream(rows)
+
+        parsed = list(csv.reader(io.StringIO(stream.read())))
+
+        self.assertEqual(100000, len(parsed))
+        self.assertEqual(['99999', 'term 99999'], parsed[-1])
+
+    def test_data_frame_rows(self):
+        data_frame = pd.DataFrame({'concept_id': [1, 2], 'parent_count': [3.0, None], 'name': ['a', None]})
+        data_frame = data_frame.astype({'parent_count': 'Int64'})
+
+        rows = list(data_frame_rows(data_frame, ['concept_id', 'parent_count', 'name']))
+
+        self.assertEqual([(1, 3, 'a'), (2, None, None)], rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
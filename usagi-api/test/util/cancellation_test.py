@@ -0,0 +1,46 @@
+import time
+import unittest
+
+from util.cancellation import CancellationRegistry
+
+
+class CancellationTest(unittest.TestCase):
+    def test_cancel_registered_task(self):
+        registry = CancellationRegistry()
+        token = registry.register(1)
+
+        self.assertFalse(token.is_cancelled())
+        self.assertTrue(registry.cancel(1))
+        self.assertTrue(token.is_cancelled())
+        self.assertIs(token, registry.register(1))
+
+    def test_cancel_unknown_task(self):
+        registry = CancellationRegistry()
+        registry.register(1)
+        registry.unregister(1)
+
+        self.assertFalse(registry.cancel(1))
+        self.assertIsNone(registry.get(1))
+
+    def test_db_check_throttled(self):
+        db_checks = []
+        token = CancellationRegistry().register(1)
+        token.set_db_check(lambda: db_checks.append(1) or len(db_checks) > 1, interval_seconds=0.05)
+
+        for _ in range(100):
+            token.is_cancelled()
+        self.assertEqual([], db_checks)
+
+        time.sleep(0.06)
+        self.assertFalse(token.is_cancelled())
+        self.assertFalse(token.is_cancelled())
+        self.assertEqual(1, len(db_checks))
+
+        time.sleep(0.06)
+        self.assertTrue(token.is_cancelled())
+        self.assertTrue(token.is_cancelled())
+        self.assertEqual(2, len(db_checks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from util.csv_util import csv_to_list
+from util.exception import InvalidUsage
+
+
+class CsvUtilTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(directory, 'source_codes.csv')
+
+    def tearDown(self):
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+        os.rmdir(os.path.dirname(self.file_path))
+
+    def _write(self, content: str):
+        with open(self.file_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+    def test_values_are_stripped_strings(self):
+        self._write('code,name,frequency\n0123, Aspirin ,10\n  A01,Sodium  ,\n')
+
+        self.assertEqual([{'code': '0123', 'name': 'Aspirin', 'frequency': '10'},
+                          {'code': 'A01', 'name': 'Sodium', 'frequency': ''}],
+                         csv_to_list(self.file_path, ','))
+
+    def test_bad_lines_are_skipped(self):
+        self._write('code;name\n1;Pulse\n2;Heart rate;extra\n3\n')
+
+        self.assertEqual([{'code': '1', 'name': 'Pulse'}, {'code': '3', 'name': ''}],
+                         csv_to_list(self.file_path, ';'))
+
+    def test_large_file(self):
+        self._write('code,name\n' + ''.join(f'{i}, name {i}\n' for i in range(100000)))
+
+        rows = csv_to_list(self.file_path, ',')
+
+        self.assertEqual(100000, len(rows))
+        self.assertEqual({'code': '99999', 'name': 'name 99999'}, rows[-1])
+
+    def test_empty_file_is_removed(self):
+        self._write('')
+
+        with self.assertRaises(InvalidUsage):
+            csv_to_list(self.file_path, ',')
+        self.assertFalse(os.path.exists(self.file_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+
+from util.dag_runner import Step, run_steps, check_steps
+
+
+class DagRunnerTest(unittest.TestCase):
+    def test_dependencies_order_and_parallelism(self):
+        finished = []
+        lock = threading.Lock()
+        active = []
+        max_active = []
+
+        def step(name):
+            def run():
+                with lock:
+                    active.append(name)
+                    max_active.append(len(active))
+                time.sleep(0.02)
+                with lock:
+                    active.remove(name)
+                    finished.append(name)
+            return run
+
+        steps = [
+            Step('a', step('a')),
+            Step('b', step('b'), ('a',)),
+            Step('c', step('c'), ('a',)),
+            Step('d', step('d'), ('a',)),
+            Step('e', step('e'), ('b', 'c')),
+        ]
+        completed = []
+
+        run_steps(steps, workers=2, on_step_completed=lambda name, seconds: completed.append(name))
+
+        self.assertEqual('a', finished[0])
+        self.assertLess(finished.index('b'), finished.index('e'))
+        self.assertLess(finished.index('c'), finished.index('e'))
+        self.assertEqual(2, max(max_active))
+        self.assertEqual(sorted(finished), sorted(completed))
+
+    def test_restart_from_failed_step(self):
+        runs = []
+        fail = [True]
+
+        def flaky():
+            runs.append('b')
+            if fail[0]:
+                raise ValueError('failed')
+
+        steps = [
+            Step('a', lambda: runs.append('a')),
+            Step('b', flaky, ('a',)),
+            Step('c', lambda: runs.append('c'), ('b',)),
+        ]
+        completed = []
+
+        with self.assertRaises(ValueError):
+            run_steps(steps, workers=2, on_step_completed=lambda name, seconds: completed.append(name))
+        self.assertEqual(['a', 'b'], runs)
+        self.assertEqual(['a'], completed)
+
+        fail[0] = False
+        runs.clear()
+        run_steps(steps, workers=2, completed=completed,
+                  on_step_completed=lambda name, seconds: completed.append(name))
+        self.assertEqual(['b', 'c'], runs)
+
+    def test_check_steps(self):
+        with self.assertRaises(ValueError):
+            check_steps([Step('a', lambda: None, ('b',))])
+        with self.assertRaises(ValueError):
+            check_steps([Step('a', lambda: None, ('b',)), Step('b', lambda: None, ('a',))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import time
+import unittest
+
+from util.rate_limiter import RateLimiter
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_limit(self):
+        limiter = RateLimiter(100)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_no_limit(self):
+        limiter = RateLimiter(0)
+        start = time.monotonic()
+        for _ in range(1000):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
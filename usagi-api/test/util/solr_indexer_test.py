@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+
+from util.solr_indexer import SolrIndexer, IndexProgress, iterate_batches, row_to_document
+
+
+class LocalSolr:
+    """Stand-in of a Solr core with pysolr.Solr add, delete and commit methods"""
+
+    def __init__(self, documents=None, fail_on_batch=None, add_delay=0.0):
+        self.documents = list(documents or [])
+        self.batches = []
+        self.commits = []
+        self.fail_on_batch = fail_on_batch
+        self.add_delay = add_delay
+        self.active_adds = 0
+        self.max_active_adds = 0
+        self._lock = threading.Lock()
+
+    def add(self, docs, commit=None, overwrite=None):
+        with self._lock:
+            batch_number = len(self.batches)
+            self.batches.append(len(docs))
+            self.active_adds += 1
+            self.max_active_adds = max(self.max_active_adds, self.active_adds)
+        try:
+            time.sleep(self.add_delay)
+            if batch_number == self.fail_on_batch:
+                raise ConnectionError('Solr is not available')
+            with self._lock:
+                self.documents.extend(docs)
+        finally:
+            with self._lock:
+                self.active_adds -= 1
+
+    def delete(self, q=None, commit=None):
+        if q == '*:*':
+            self.documents = []
+
+    def commit(self, softCommit=False):
+        self.commits.append('soft' if softCommit else 'hard')
+
+
+class SolrIndexerTest(unittest.TestCase):
+    def test_index_documents_by_batches(self):
+        solr = LocalSolr(documents=[{'term': 'old'}])
+        documents = [{'concept_id': i, 'term': f'term {i}'} for i in range(25)]
+
+        progress = SolrIndexer(solr, 'usagi', workers=3, batch_size=10, soft_commit_interval=0).index(documents, 25)
+
+        self.assertEqual(25, progress.done)
+        self.assertEqual([10, 10, 5], sorted(solr.batches, reverse=True))
+        self.assertEqual(sorted(d['concept_id'] for d in documents), sorted(d['concept_id'] for d in solr.documents))
+        self.assertEqual(['hard'], solr.commits)
+
+    def test_batches_are_posted_in_parallel(self):
+        solr = LocalSolr(add_delay=0.02)
+        documents = ({'concept_id': i} for i in range(40))
+
+        SolrIndexer(solr, 'usagi', workers=4, batch_size=5, soft_commit_interval=0).index(documents)
+
+        self.assertEqual(40, len(solr.documents))
+        self.assertGreater(solr.max_active_adds, 1)
+        self.assertLessEqual(solr.max_active_adds, 4)
+
+    def test_soft_commits_while_indexing(self):
+        solr = LocalSolr(add_delay=0.01)
+        documents = ({'concept_id': i} for i in range(20))
+
+        SolrIndexer(solr, 'usagi', workers=1, batch_size=2, soft_commit_interval=0.001).index(documents, clean=False)
+
+        self.assertIn('soft', solr.commits)
+        self.assertEqual('hard', solr.commits[-1])
+
+    def test_clean_index_commits_only_after_all_documents_added(self):
+        solr = LocalSolr(documents=[{'term': 'old'}], add_delay=0.01)
+        documents = ({'concept_id': i} for i in range(20))
+
+        SolrIndexer(solr, 'usagi', workers=1, batch_size=2, soft_commit_interval=0.001).index(documents)
+
+        self.assertEqual(['hard'], solr.commits)
+        self.assertEqual(20, len(solr.documents))
+
+    def test_failed_batch_raises_error_without_commit(self):
+        solr = LocalSolr(fail_on_batch=1)
+        documents = ({'concept_id': i} for i in range(30))
+
+        with self.assertRaises(ConnectionError):
+            SolrIndexer(solr, 'usagi', workers=2, batch_size=5, soft_commit_interval=0).index(documents)
+        self.assertNotIn('hard', solr.commits)
+
+    def test_row_to_document_skips_nulls(self):
+        self.assertEqual({'concept_id': 1, 'term': ''},
+                         row_to_document({'concept_id': 1, 'term': '', 'standard_concept': None}))
+
+    def test_iterate_batches(self):
+        self.assertEqual([[0, 1], [2, 3], [4]], list(iterate_batches(range(5), 2)))
+        self.assertEqual([], list(iterate_batches([], 2)))
+
+    def test_progress_rate_and_eta(self):
+        progress = IndexProgress('usagi', total=100, interval=3600)
+        self.assertIsNone(progress.eta)
+        time.sleep(0.01)
+        progress.add(50)
+        self.assertGreater(progress.rate, 0)
+        self.assertGreater(progress.eta, 0)
+        progress.add(50)
+        self.assertEqual(0, progress.eta)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from util.throttled_progress import ThrottledProgress
+
+
+class ThrottledProgressTest(unittest.TestCase):
+    def test_flush_every_n_steps(self):
+        flushed = []
+        progress = ThrottledProgress(25, lambda done, message: flushed.append((done, message)),
+                                     flush_every=10, flush_interval=60)
+
+        for i in range(25):
+            progress.step(f'code {i}')
+
+        self.assertEqual([(10, 'code 9'), (20, 'code 19')], flushed)
+        self.assertEqual(100, progress.percent)
+
+        progress.flush()
+        progress.flush()
+        self.assertEqual((25, 'code 24'), flushed[-1])
+        self.assertEqual(3, len(flushed))
+
+    def test_flush_by_interval(self):
+        flushed = []
+        progress = ThrottledProgress(1000, lambda done, message: flushed.append(done),
+                                     flush_every=1000, flush_interval=0.02)
+
+        progress.step('first')
+        time.sleep(0.03)
+        progress.step('second')
+
+        self.assertEqual([2], flushed)
+
+    def test_step_by_several_items(self):
+        flushed = []
+        progress = ThrottledProgress(10, lambda done, message: flushed.append(done),
+                                     flush_every=5, flush_interval=60)
+
+        progress.step('group', 3)
+        progress.step('group', 4)
+
+        self.assertEqual([7], flushed)
+        self.assertEqual(70, progress.percent)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import time
+import unittest
+
+from util.ttl_cache import TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        computed = []
+
+        def compute():
+            computed.append(1)
+            return 'value'
+
+        self.assertEqual('value', cache.get_or_compute('key', compute))
+        self.assertEqual('value', cache.get_or_compute('key', compute))
+        self.assertEqual(1, len(computed))
+        self.assertEqual(0.5, cache.stats()['hitRatio'])
+
+    def test_least_recently_used_evicted(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('b', lambda: 2)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('c', lambda: 3)
+
+        self.assertEqual(1, cache.get_or_compute('a', lambda: 'recomputed'))
+        self.assertEqual('recomputed', cache.get_or_compute('b', lambda: 'recomputed'))
+
+    def test_expired_and_cleared(self):
+        cache = TTLCache(max_size=10, ttl=0.01)
+        cache.get_or_compute('a', lambda: 1)
+        time.sleep(0.02)
+        self.assertEqual(2, cache.get_or_compute('a', lambda: 2))
+
+        cache.clear()
+        self.assertEqual(0, cache.stats()['size'])
+
+
+if __name__ == '__main__':
+    unittest.main()
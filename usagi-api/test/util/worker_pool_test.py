@@ -0,0 +1,68 @@
+import threading
+import time
+import unittest
+
+from util.worker_pool import map_ordered
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def test_results_in_input_order(self):
+        def square(index, item):
+            time.sleep(0.001 * (item % 3))
+            return item * item
+
+        results = map_ordered(square, range(50), workers=8)
+
+        self.assertEqual([i * i for i in range(50)], results)
+
+    def test_bounded_concurrency(self):
+        active = []
+        max_active = []
+        lock = threading.Lock()
+
+        def handle(index, item):
+            with lock:
+                active.append(item)
+                max_active.append(len(active))
+            time.sleep(0.002)
+            with lock:
+                active.remove(item)
+
+        map_ordered(handle, range(40), workers=3)
+
+        self.assertLessEqual(max(max_active), 3)
+
+    def test_stop(self):
+        handled = []
+
+        results = map_ordered(lambda index, item: handled.append(item),
+                              range(100),
+                              workers=4,
+                              should_stop=lambda: len(handled) >= 10)
+
+        self.assertIsNone(results)
+        self.assertLess(len(handled), 100)
+
+    def test_error_raised(self):
+        def fail_on_five(index, item):
+            if item == 5:
+                raise ValueError('five')
+            return item
+
+        with self.assertRaises(ValueError):
+            map_ordered(fail_on_five, range(20), workers=4)
+
+    def test_worker_hooks_called_in_pool_threads(self):
+        started = []
+        stopped = []
+
+        map_ordered(lambda index, item: item, range(10), workers=2,
+                    on_worker_start=lambda: started.append(1),
+                    on_worker_stop=lambda: stopped.append(1))
+
+        self.assertEqual(2, len(started))
+        self.assertEqual(2, len(stopped))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,9 +10,10 @@ from model.usagi.conversion_status import ConversionStatus
 from model.usagi_data.code_mapping import ScoredConceptEncoder
 from service.code_mapping_conversion_service import get_conversion_by_username, update_conversion, create_conversion
 from service.code_mapping_log_service import get_logs
+from service.code_mapping_result_service import get_code_mapping_result_page
 from service.code_mapping_snapshot_service import get_snapshots_name_list, get_snapshot, delete_snapshot
-from service.filters_service import get_filters
-from service.search_service import search_usagi
+from service.filters_service import get_filters_with_etag
+from service.search_service import search_usagi_cached, search_results_cache
 from service.source_to_concept_map_service import delete_source_to_concept_by_snapshot_name
 from service.usagi_service import get_concept_mapping_result, create_concept_mapping, extract_codes_from_csv, \
     save_concept_mapping_result
@@ -90,7 +91,8 @@ def code_mapping_conversion_status(current_user):
         'id': conversion.id,
         'statusCode': conversion.status_code,
         'statusName': conversion.status_name,
-        'logs': [log for log in logs]
+        'percent': logs[-1]['percent'] if logs else 0,
+        'logs': logs
     })
 
 
@@ -98,10 +100,10 @@ def code_mapping_conversion_status(current_user):
 @username_header
 def abort_code_mapping_conversion(current_user):
     app.logger.info("REST request to abort Code Mapping conversion")
-    cancel_concept_mapping_task(current_user)
     conversion_id = get_conversion_id(request)
     conversion = get_conversion_by_username(conversion_id, current_user)
     update_conversion(conversion.id, ConversionStatus.ABORTED)
+    cancel_concept_mapping_task(current_user, conversion.id)
     return '', http.HTTPStatus.NO_CONTENT
 
 
@@ -114,6 +116,24 @@ def code_mapping_conversion_result(current_user):
     return jsonify(result)
 
 
+@usagi.route('/api/code-mapping/result/page', methods=['GET'])
+@username_header
+def code_mapping_conversion_result_page(current_user):
+    app.logger.info("REST request to GET Code Mapping conversion result page")
+    conversion_id = get_conversion_id(request)
+    statuses = request.args.get('status')
+    result_page = get_code_mapping_result_page(conversion_id,
+                                               current_user,
+                                               page=request.args.get('page', 1, int),
+                                               page_size=request.args.get('pageSize', 100, int),
+                                               sort=request.args.get('sort', 'position'),
+                                               order=request.args.get('order', 'asc'),
+                                               statuses=statuses.split(',') if statuses else None,
+                                               min_score=request.args.get('minScore', None, float),
+                                               max_score=request.args.get('maxScore', None, float))
+    return jsonify(result_page)
+
+
 """
 Request body: {
     term: str
@@ -141,10 +161,16 @@ def get_term_search_results_call():
         if filters['searchMode'] == QUERY_SEARCH_MODE \
         else request.json['term']
     source_auto_assigned_concept_ids = request.json['sourceAutoAssignedConceptIds']
-    search_result = search_usagi(filters, term, source_auto_assigned_concept_ids)
+    search_result = search_usagi_cached(filters, term, source_auto_assigned_concept_ids)
     return json.dumps(search_result, indent=4, cls=ScoredConceptEncoder)
 
 
+@usagi.route('/api/code-mapping/search-by-term/cache', methods=['GET'])
+def get_term_search_cache_stats_call():
+    app.logger.info("REST request to GET search by term cache statistics")
+    return jsonify(search_results_cache.stats())
+
+
 @usagi.route('/api/code-mapping/save', methods=['POST'])
 @username_header
 def save_mapped_codes_call(current_user):
@@ -196,8 +222,11 @@ def delete_snapshot_call(current_user):
 @usagi.route('/api/filters', methods=['GET'])
 def get_filters_call():
     app.logger.info("REST request to GET filters")
-    result = get_filters()
-    return jsonify(result)
+    result, etag = get_filters_with_etag()
+    response = jsonify(result)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.errorhandler(InvalidUsage)
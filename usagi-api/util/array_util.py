@@ -1,2 +1,11 @@
 def remove_duplicates(results):
-    return [i for n, i in enumerate(results) if i not in results[n + 1:]]
\ No newline at end of file
+    """Remove Solr documents with the same concept_id and term, keep the first occurrence order"""
+    seen = set()
+    unique_results = []
+    for item in results:
+        term = item.get('term')
+        key = (item.get('concept_id'), tuple(term) if isinstance(term, list) else term)
+        if key not in seen:
+            seen.add(key)
+            unique_results.append(item)
+    return unique_results
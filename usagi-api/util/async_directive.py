@@ -1,24 +1,29 @@
 import asyncio
 
 from app import app
+from util.cancellation import conversion_cancellation_registry
 
 user_concept_mapping_tasks = {}
 
 
 def fire_and_forget_concept_mapping(f):
     def wrapped(*args, **kwargs):
+        username, conversion = args[0], args[1]
+        # Registered before the task starts, so abort is not missed while the task is queued
+        conversion_cancellation_registry.register(conversion.id)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         task = asyncio.get_event_loop().run_in_executor(None, f, *args, *kwargs)
-        username = args[0]
         user_concept_mapping_tasks[username] = task
         return task
     return wrapped
 
 
-def cancel_concept_mapping_task(username):
-    if user_concept_mapping_tasks[username].cancel():
-        app.logger.info("Code Mapping conversion task successfully canceled")
-    else:
-        app.logger.error("Can not cancel Code Mapping conversion task")
+def cancel_concept_mapping_task(username, conversion_id: int):
+    """
+    Signal conversion to stop. The token is unregistered by the task itself when it finishes,
+    so the signal is not lost if the task has not reached the mapping loop yet
+    """
+    if conversion_cancellation_registry.cancel(conversion_id):
+        app.logger.info("Code Mapping conversion task cancellation requested")
     user_concept_mapping_tasks.pop(username, None)
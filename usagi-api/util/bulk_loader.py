@@ -0,0 +1,200 @@
+import io
+import logging
+import time
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from peewee import Database
+
+
+def format_csv_value(value) -> str:
+    """None is an unquoted empty value (NULL in COPY CSV format), strings are always quoted, so '' is not NULL"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+class RowsCsvStream(io.TextIOBase):
+    """Read-only file of rows in Postgres COPY CSV format, rows are formatted lazily as COPY reads the file"""
+
+    def __init__(self, rows: Iterable[Sequence]):
+        self._rows = iter(rows)
+        self._pending = ''
+        self.row_count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1) -> str:
+        lines = []
+        length = len(self._pending)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ','.join(format_csv_value(value) for value in row) + '\n'
+            lines.append(line)
+            length += len(line)
+            self.row_count += 1
+        data = self._pending + ''.join(lines)
+        if size < 0:
+            result, self._pending = data, ''
+        else:
+            result, self._pending = data[:size], data[size:]
+        return result
+
+    def readline(self, size: int = -1) -> str:
+        return self.read(size)
+
+
+def data_frame_rows(data_frame, columns: List[str]) -> Iterator[tuple]:
+    """Rows of data frame columns, NaN and NA values are replaced with None"""
+    values = data_frame[columns].astype(object)
+    values = values.where(values.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+class BulkLoader:
+    """
+    Load rows to a Postgres table by COPY FROM STDIN or by INSERT ... SELECT.
+
+    With replace=True rows are loaded to an unlogged staging table without indexes,
+    after load the staging table gets indexes of the target table and replaces it by rename in one transaction.
+    Otherwise rows are appended to the target table, its secondary indexes are dropped before load and created after.
+    Use as a context manager, indexes are (re)created and table is replaced on exit without error
+    """
+
+    def __init__(self,
+                 database: Database,
+                 schema: str,
+                 table: str,
+                 columns: List[str],
+                 replace: bool = False,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        self.database = database
+        self.schema = schema
+        self.table = table
+        self.columns = columns
+        self.replace = replace
+        self.staging_table = f'{table}_staging'
+        self.row_count = 0
+        self._indexes: List[Tuple[str, str]] = []
+        self._primary_key_columns: Optional[List[str]] = None
+        self._start_time = None
+        self._logger = logger
+
+    @property
+    def target(self) -> str:
+        return f'"{self.schema}"."{self.staging_table if self.replace else self.table}"'
+
+    def __enter__(self):
+        self._start_time = time.perf_counter()
+        self._indexes = self._get_secondary_indexes()
+        with self.database.atomic():
+            if self.replace:
+                self._primary_key_columns = self._get_primary_key_columns()
+                self.database.execute_sql(f'DROP TABLE IF EXISTS {self.target}')
+                self.database.execute_sql(f'CREATE UNLOGGED TABLE {self.target} '
+                                          f'(LIKE "{self.schema}"."{self.table}" INCLUDING DEFAULTS)')
+            else:
+                for index_name, _ in self._indexes:
+                    self.database.execute_sql(f'DROP INDEX "{self.schema}"."{index_name}"')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            if self.replace:
+                self.database.execute_sql(f'DROP TABLE IF EXISTS {self.target}')
+            else:
+                self._create_indexes()
+            return False
+        if self.replace:
+            self._replace_table()
+        else:
+            self._create_indexes()
+        self._logger.info(f'{self.schema}.{self.table}: loaded {self.row_count} rows '
+                          f'in {time.perf_counter() - self._start_time:.1f}s')
+        return False
+
+    def copy_rows(self, rows: Iterable[Sequence]) -> int:
+        """Stream rows with values in columns order by COPY, return count of copied rows"""
+        stream = RowsCsvStream(rows)
+        columns = ', '.join(f'"{column}"' for column in self.columns)
+        with self.database.atomic():
+            cursor = self.database.cursor()
+            cursor.copy_expert(f'COPY {self.target} ({columns}) FROM STDIN WITH (FORMAT csv)', stream)
+        self.row_count += stream.row_count
+        return stream.row_count
+
+    def copy_data_frame(self, data_frame) -> int:
+        return self.copy_rows(data_frame_rows(data_frame, self.columns))
+
+    def insert_from_select(self, query) -> int:
+        """Insert rows of a select query of the same database, rows are not transferred to the client"""
+        select_sql, params = query.sql()
+        columns = ', '.join(f'"{column}"' for column in self.columns)
+        with self.database.atomic():
+            cursor = self.database.execute_sql(f'INSERT INTO {self.target} ({columns}) {select_sql}', params)
+        self.row_count += cursor.rowcount
+        return cursor.rowcount
+
+    def _get_secondary_indexes(self) -> List[Tuple[str, str]]:
+        cursor = self.database.execute_sql(
+            'SELECT i.relname, pg_get_indexdef(x.indexrelid) '
+            'FROM pg_index x '
+            'JOIN pg_class i ON i.oid = x.indexrelid '
+            'WHERE x.indrelid = %s::regclass AND NOT x.indisprimary',
+            (f'"{self.schema}"."{self.table}"',)
+        )
+        return list(cursor.fetchall())
+
+    def _get_primary_key_columns(self) -> Optional[List[str]]:
+        cursor = self.database.execute_sql(
+            'SELECT a.attname '
+            'FROM pg_index x '
+            'JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = ANY(x.indkey) '
+            'WHERE x.indrelid = %s::regclass AND x.indisprimary',
+            (f'"{self.schema}"."{self.table}"',)
+        )
+        columns = [row[0] for row in cursor.fetchall()]
+        return columns or None
+
+    def _create_indexes(self):
+        for _, index_definition in self._indexes:
+            self.database.execute_sql(index_definition)
+
+    def _replace_table(self):
+        self.database.execute_sql(f'ALTER TABLE {self.target} SET LOGGED')
+        if self._primary_key_columns:
+            columns = ', '.join(f'"{column}"' for column in self._primary_key_columns)
+            self.database.execute_sql(f'ALTER TABLE {self.target} '
+                                      f'ADD CONSTRAINT "{self.staging_table}_pkey" PRIMARY KEY ({columns})')
+        staging_indexes = []
+        for index_name, index_definition in self._indexes:
+            staging_index_name = f'{index_name}_staging'
+            self.database.execute_sql(
+                index_definition
+                .replace(f'INDEX {index_name} ON', f'INDEX "{staging_index_name}" ON', 1)
+                .replace(f' ON {self.schema}.{self.table} ', f' ON {self.target} ', 1)
+            )
+            staging_indexes.append((staging_index_name, index_name))
+        with self.database.atomic():
+            # Sequences of serial columns are owned by the target table and would be dropped with it
+            cursor = self.database.execute_sql(
+                'SELECT a.attname, pg_get_serial_sequence(%s, a.attname) '
+                'FROM pg_attribute a '
+                'WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped',
+                (f'"{self.schema}"."{self.table}"', f'"{self.schema}"."{self.table}"')
+            )
+            for column, sequence in cursor.fetchall():
+                if sequence:
+                    self.database.execute_sql(f'ALTER SEQUENCE {sequence} OWNED BY {self.target}."{column}"')
+            self.database.execute_sql(f'DROP TABLE "{self.schema}"."{self.table}"')
+            self.database.execute_sql(f'ALTER TABLE {self.target} RENAME TO "{self.table}"')
+            if self._primary_key_columns:
+                self.database.execute_sql(f'ALTER TABLE "{self.schema}"."{self.table}" '
+                                          f'RENAME CONSTRAINT "{self.staging_table}_pkey" TO "{self.table}_pkey"')
+            for staging_index_name, index_name in staging_indexes:
+                self.database.execute_sql(f'ALTER INDEX "{self.schema}"."{staging_index_name}" '
+                                          f'RENAME TO "{index_name}"')
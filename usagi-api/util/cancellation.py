@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag of a background task. is_cancelled is a memory read,
+    when db check is set it is also called at most once per interval to see cancellation requested by another process
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._db_check: Optional[Callable[[], bool]] = None
+        self._db_check_interval = 0
+        self._next_db_check = 0
+        self._db_check_lock = threading.Lock()
+
+    def set_db_check(self, db_check: Callable[[], bool], interval_seconds: float):
+        self._db_check_interval = interval_seconds
+        self._next_db_check = time.monotonic() + interval_seconds
+        self._db_check = db_check
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self._db_check is not None and time.monotonic() >= self._next_db_check:
+            # Only one worker checks DB, others go on
+            if self._db_check_lock.acquire(blocking=False):
+                try:
+                    if time.monotonic() >= self._next_db_check:
+                        if self._db_check():
+                            self._event.set()
+                        self._next_db_check = time.monotonic() + self._db_check_interval
+                finally:
+                    self._db_check_lock.release()
+        return self._event.is_set()
+
+
+class CancellationRegistry:
+    """Cancellation tokens of running tasks by task id"""
+
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def register(self, task_id: int) -> CancellationToken:
+        with self._lock:
+            token = self._tokens.get(task_id)
+            if token is None:
+                token = CancellationToken()
+                self._tokens[task_id] = token
+            return token
+
+    def get(self, task_id: int) -> Optional[CancellationToken]:
+        with self._lock:
+            return self._tokens.get(task_id)
+
+    def cancel(self, task_id: int) -> bool:
+        """Signal task cancellation. Return False if task is not running in this process"""
+        with self._lock:
+            token = self._tokens.get(task_id)
+        if token is None:
+            return False
+        token.cancel()
+        return True
+
+    def unregister(self, task_id: int):
+        with self._lock:
+            self._tokens.pop(task_id, None)
+
+
+# Cancellation tokens of code mapping conversions by conversion id
+conversion_cancellation_registry = CancellationRegistry()
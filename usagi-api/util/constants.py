@@ -1,10 +1,36 @@
 from pathlib import Path
 
-from app import app
-
 USAGI_CORE_NAME = 'usagi'
 
-SOLR_CONN_STRING = f"{app.config['SOLR_URL']}/solr/{USAGI_CORE_NAME}"
+# Defaults, can be overridden by app config keys with the same names
+SOLR_TIMEOUT = 30
+SOLR_RETRIES = 3
+SOLR_RETRY_BACKOFF_FACTOR = 0.3
+SOLR_POOL_SIZE = 20
+SEARCH_RESULT_SIZE = 100
+
+MAX_SEARCH_RESULT_SIZE = 1000
+# Max count and seconds to live of cached search by term results
+SEARCH_CACHE_SIZE = 1000
+SEARCH_CACHE_TTL = 3600
+# Seconds to live of cached filters, the cache is also cleared by Solr index build
+FILTERS_CACHE_TTL = 3600
+
+# Count of source codes searched concurrently by automatic code mapping
+CONCEPT_MAPPING_WORKERS = 4
+# Max Solr searches per second of one code mapping conversion, 0 - no limit
+CONCEPT_MAPPING_SOLR_RATE_LIMIT = 0
+# Set if the API runs in several processes, then running conversions also check abort status in DB
+CONCEPT_MAPPING_MULTI_PROCESS = False
+# Seconds between DB abort status checks
+CONVERSION_ABORT_CHECK_INTERVAL = 5
+# Conversion progress is stored to log every N searched codes or every T seconds
+PROGRESS_LOG_EVERY_CODES = 100
+PROGRESS_LOG_INTERVAL = 5
+# Count of last logs returned by conversion status
+STATUS_LOGS_LIMIT = 50
+# Count of code mapping result rows inserted at once
+RESULT_ROWS_BATCH_SIZE = 500
 
 CONCEPT_IDS = 'autoConceptId'
 SOURCE_CODE_TYPE_STRING = "S"
@@ -19,4 +45,17 @@ UPLOAD_SOURCE_CODES_FOLDER = Path('model/generate/source_codes')
 
 QUERY_SEARCH_MODE = 'query'
 
-INSERT_BATCH_SIZE = 10000
+# Count of concept ids loaded to memory at once when usagi data tables are filled
+USAGI_DATA_CHUNK_SIZE = 100000
+# Fully rebuilt usagi data tables are loaded to unlogged staging tables and replace the tables by rename
+USAGI_DATA_USE_STAGING_TABLES = True
+# Count of usagi data fill steps run in parallel
+USAGI_DATA_FILL_WORKERS = 4
+
+# Solr indexing of usagi concepts: parallel update workers, documents per update request,
+# rows fetched from the server-side cursor at once, seconds between soft commits and between progress logs
+SOLR_INDEX_WORKERS = 4
+SOLR_INDEX_BATCH_SIZE = 5000
+SOLR_INDEX_FETCH_SIZE = 20000
+SOLR_INDEX_SOFT_COMMIT_INTERVAL = 60
+SOLR_INDEX_PROGRESS_INTERVAL = 30
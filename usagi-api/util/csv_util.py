@@ -7,16 +7,17 @@ from util.exception import InvalidUsage
 
 
 def csv_to_list(filepath, delimiter):
-    json_array = []
+    """
+    Parse CSV file to list of {column: value} dicts. All values are read as strings, so codes like 0123 are kept
+    as is, and stripped by columns. Missing values are empty strings, lines with extra fields are skipped
+    """
     try:
-        data = pd.read_csv(filepath, delimiter=delimiter, error_bad_lines=False,
-                           skipinitialspace=True, encoding="utf-8").fillna('')
-        for row in data.iterrows():
-            json_row = {}
-            for col in data.columns:
-                json_row[col] = str(row[1][col]).strip()
-            json_array.append(json_row)
-        return json_array
+        data = pd.read_csv(filepath, delimiter=delimiter, dtype=str, na_filter=False, on_bad_lines='skip',
+                           skipinitialspace=True, encoding="utf-8")
     except EmptyDataError as error:
         os.remove(filepath)
-        raise InvalidUsage('Empty CSV file', base=error)
\ No newline at end of file
+        raise InvalidUsage('Empty CSV file', base=error)
+    data = data.fillna('')
+    for column in data.columns:
+        data[column] = data[column].str.strip()
+    return data.to_dict('records')
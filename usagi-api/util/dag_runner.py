@@ -0,0 +1,85 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Step(NamedTuple):
+    name: str
+    run: Callable[[], None]
+    dependencies: Tuple[str, ...] = ()
+
+
+def check_steps(steps: List[Step]):
+    """Raise ValueError if step names are not unique, a dependency is unknown or dependencies have a cycle"""
+    steps_by_name = {step.name: step for step in steps}
+    if len(steps_by_name) != len(steps):
+        raise ValueError('Step names are not unique')
+    for step in steps:
+        for dependency in step.dependencies:
+            if dependency not in steps_by_name:
+                raise ValueError(f'Step {step.name} depends on unknown step {dependency}')
+    visited = set()
+    visiting = set()
+
+    def visit(name: str):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f'Steps dependency cycle contains {name}')
+        visiting.add(name)
+        for dependency in steps_by_name[name].dependencies:
+            visit(dependency)
+        visiting.remove(name)
+        visited.add(name)
+
+    for step in steps:
+        visit(step.name)
+
+
+def run_steps(steps: List[Step],
+              workers: int,
+              completed: Iterable[str] = (),
+              on_step_completed: Callable[[str, float], None] = lambda name, seconds: None,
+              logger: logging.Logger = logging.getLogger(__name__)):
+    """
+    Run steps by at most workers threads, a step starts when all its dependencies are completed.
+    Steps from completed are skipped, so a failed run can be restarted from the failed steps.
+    When a step fails no new steps are started, running steps are awaited and the error is raised
+    """
+    check_steps(steps)
+    workers = max(1, workers)
+    completed = set(completed)
+    pending = [step for step in steps if step.name not in completed]
+    running: Dict = {}
+    error: Optional[BaseException] = None
+
+    def run_step(step: Step) -> float:
+        logger.info(f'Step {step.name} started')
+        start = time.perf_counter()
+        step.run()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            if error is None:
+                ready = [step for step in pending if all(d in completed for d in step.dependencies)]
+                for step in ready[:workers - len(running)]:
+                    pending.remove(step)
+                    running[executor.submit(run_step, step)] = step
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    logger.error(f'Step {step.name} failed: {e}')
+                    error = error or e
+                    continue
+                completed.add(step.name)
+                logger.info(f'Step {step.name} completed in {seconds:.1f}s')
+                on_step_completed(step.name, seconds)
+    if error is not None:
+        raise error
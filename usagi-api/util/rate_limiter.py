@@ -0,0 +1,21 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe limiter, allows at most rate calls of acquire per second. Rate <= 0 means no limit"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(self._next_time, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
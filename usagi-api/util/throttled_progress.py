@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class ThrottledProgress:
+    """
+    Thread-safe progress counter. Calls flush(done, message) at most every flush_every items
+    or every flush_interval seconds, whichever comes first
+    """
+
+    def __init__(self,
+                 total: int,
+                 flush: Callable[[int, str], None],
+                 flush_every: int,
+                 flush_interval: float):
+        self.total = total
+        self.done = 0
+        self.message: Optional[str] = None
+        self._flush = flush
+        self._flush_every = max(1, flush_every)
+        self._flush_interval = flush_interval
+        self._flushed_done = 0
+        self._last_flush_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def percent(self) -> int:
+        return self.done * 100 // self.total if self.total else 100
+
+    def step(self, message: str, count: int = 1):
+        with self._lock:
+            self.message = message
+            self.done += count
+            if self.done - self._flushed_done < self._flush_every \
+                    and time.monotonic() - self._last_flush_time < self._flush_interval:
+                return
+            done = self._mark_flushed()
+        self._flush(done, message)
+
+    def flush(self):
+        """Flush progress not flushed yet"""
+        with self._lock:
+            if self.done == self._flushed_done:
+                return
+            done, message = self._mark_flushed(), self.message
+        self._flush(done, message)
+
+    def _mark_flushed(self) -> int:
+        self._flushed_done = self.done
+        self._last_flush_time = time.monotonic()
+        return self.done
@@ -0,0 +1,49 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """Thread-safe LRU cache, entries expire ttl seconds after they were put"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return cached value of key or compute and cache it. Compute runs outside the lock"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRatio': self.hits / requests if requests else 0
+            }
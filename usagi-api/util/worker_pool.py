@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def map_ordered(func: Callable[[int, T], R],
+                items: Iterable[T],
+                workers: int,
+                should_stop: Callable[[], bool] = lambda: False,
+                on_worker_start: Callable[[], None] = lambda: None,
+                on_worker_stop: Callable[[], None] = lambda: None) -> Optional[List[R]]:
+    """
+    Call func(index, item) for all items by at most workers threads.
+    Return results in input order or None if should_stop returned True before all items were handled.
+    First error stops all workers and is raised. Pool threads call on_worker_start and on_worker_stop,
+    a single worker runs in the calling thread
+    """
+    items = list(items)
+    results: List[Optional[R]] = [None] * len(items)
+    items_iterator = iter(enumerate(items))
+    iterator_lock = threading.Lock()
+    stop = threading.Event()
+    stopped_by_request = threading.Event()
+
+    def work():
+        try:
+            while not stop.is_set():
+                with iterator_lock:
+                    next_item = next(items_iterator, None)
+                if next_item is None:
+                    return
+                if should_stop():
+                    stopped_by_request.set()
+                    stop.set()
+                    return
+                index, item = next_item
+                results[index] = func(index, item)
+        except BaseException:
+            stop.set()
+            raise
+
+    def work_in_pool_thread():
+        on_worker_start()
+        try:
+            work()
+        finally:
+            on_worker_stop()
+
+    workers = max(1, min(workers, len(items)))
+    if workers == 1:
+        work()
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(work_in_pool_thread) for _ in range(workers)]
+        for future in futures:
+            future.result()
+    return None if stopped_by_request.is_set() else results